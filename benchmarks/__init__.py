@@ -0,0 +1 @@
+"""性能基准测试，运行方式：python -m benchmarks.run -h"""
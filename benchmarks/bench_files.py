@@ -0,0 +1,31 @@
+import os
+
+from benchmarks.timing import measure, summarize
+from pkg.utils.file_tools import get_file_md5sum
+from pkg.utils.hash_cache import FileHashCache
+
+
+def bench_md5sum(ctx):
+    images = ctx.vault.images
+    durations = measure(lambda: [get_file_md5sum(img) for img in images], ctx.repeat)
+    return [summarize('get_file_md5sum', durations, len(images), ctx.vault.total_image_bytes)]
+
+
+def bench_hash_cache(ctx):
+    images = ctx.vault.images
+    db_path = os.path.join(ctx.workdir, 'bench_hash_cache.sqlite3')
+    caches = []
+
+    def new_cache():
+        if caches:
+            caches.pop().close()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+        caches.append(FileHashCache(db_path))
+
+    cold = measure(lambda: [caches[-1].get_md5sum(img) for img in images], ctx.repeat, setup=new_cache)
+    warm = measure(lambda: [caches[-1].get_md5sum(img) for img in images], ctx.repeat)
+    caches.pop().close()
+    return [summarize('FileHashCache (cold)', cold, len(images), ctx.vault.total_image_bytes),
+            summarize('FileHashCache (cached)', warm, len(images))]
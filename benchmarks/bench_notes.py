@@ -0,0 +1,48 @@
+import os
+
+from benchmarks.timing import measure, summarize
+from pkg.utils import file_tools
+from src.obsidian import find_ob_imgs, update_ob_file, scan_notes
+
+BENCH_SUFFIX = '_bench'
+
+
+def bench_find_ob_imgs(ctx):
+    notes = ctx.vault.notes
+    durations = measure(lambda: [find_ob_imgs(note) for note in notes], ctx.repeat,
+                        setup=file_tools._ENCODING_CACHE.clear)
+    return [summarize('find_ob_imgs', durations, len(notes), ctx.vault.total_note_bytes)]
+
+
+def bench_scan_notes(ctx):
+    notes = ctx.vault.notes
+    durations = measure(lambda: scan_notes(notes, ctx.workers), ctx.repeat)
+    return [summarize('scan_notes (process pool)', durations, len(notes), ctx.vault.total_note_bytes)]
+
+
+def bench_update_ob_file(ctx):
+    notes = ctx.vault.notes
+    img_url_map = {os.path.basename(img): f'https://bench.example.com/obsidian/{os.path.basename(img)}'
+                   for img in ctx.vault.images}
+    results = []
+    try:
+        durations = measure(lambda: [update_ob_file(note, img_url_map, BENCH_SUFFIX) for note in notes],
+                            ctx.repeat)
+        results.append(summarize('update_ob_file (rewrite)', durations, len(notes), ctx.vault.total_note_bytes))
+        durations = measure(lambda: [update_ob_file(note, {}, BENCH_SUFFIX) for note in notes], ctx.repeat)
+        results.append(summarize('update_ob_file (no match)', durations, len(notes), ctx.vault.total_note_bytes))
+    finally:
+        for note in notes:
+            bench_note = note.replace('.md', f'{BENCH_SUFFIX}.md')
+            if os.path.exists(bench_note):
+                os.remove(bench_note)
+    return results
+
+
+def bench_get_encoding(ctx):
+    notes = ctx.vault.notes
+    cold = measure(lambda: [file_tools.get_encoding(note) for note in notes], ctx.repeat,
+                   setup=file_tools._ENCODING_CACHE.clear)
+    warm = measure(lambda: [file_tools.get_encoding(note) for note in notes], ctx.repeat)
+    return [summarize('get_encoding (cold)', cold, len(notes), ctx.vault.total_note_bytes),
+            summarize('get_encoding (cached)', warm, len(notes))]
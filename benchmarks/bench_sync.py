@@ -0,0 +1,96 @@
+import itertools
+
+from benchmarks.timing import measure, summarize
+from pkg.tencent_cos.cos import TencentCos, ACCOUNT_METADATA
+from pkg.tencent_cos.cos_bucket import TencentCosBucket
+from pkg.tencent_cos.emulator import CosEmulator, EmulatorOptions
+from src.config_loader import ConfigLoader
+from src.sync_engine import SyncEngine
+
+REMOTE_DIR = 'obsidian'
+_bucket_ids = itertools.count()
+
+
+def _use_new_bucket(ctx, emulator: CosEmulator):
+    """在模拟器中新建一个存储桶和远程目录，并写入配置"""
+    bucket_name = f'bench{next(_bucket_ids)}'
+    emulator.create_bucket(bucket_name, 'ap-guangzhou')
+    ACCOUNT_METADATA.invalidate()  # 直接在模拟器中建桶，需要清除缓存的存储桶列表
+    loader = ConfigLoader()
+    config = loader.read_config()
+    config.cos.tencent.secret_id = 'bench-id'
+    config.cos.tencent.secret_key = 'bench-key'
+    config.cos.tencent.bucket = bucket_name
+    config.cos.tencent.dir = REMOTE_DIR
+    config.obsidian.attachment_path = ctx.vault.attachment_path
+    config.uploader.max_workers = ctx.workers
+    loader.update_config(config)
+    TencentCosBucket(TencentCos('bench-id', 'bench-key'), bucket_name).mkdir(REMOTE_DIR)
+    return bucket_name
+
+
+def _new_engine(ctx):
+    engine = SyncEngine()
+    engine.local_files = list(ctx.vault.images)
+    return engine
+
+
+def bench_check_and_plan(ctx):
+    """在无延迟的模拟器上测试check_files和upload_files的判断逻辑(远程文件已全部存在)"""
+    emulator = CosEmulator(EmulatorOptions(seed=ctx.seed))
+    emulator.install()
+    _use_new_bucket(ctx, emulator)
+    engine = _new_engine(ctx)
+    engine.upload_files()
+    images = len(ctx.vault.images)
+    results = []
+
+    def run(check_md5: bool, refresh: bool, func):
+        def setup():
+            engine.check_md5 = check_md5
+            engine.refresh_remote = refresh
+            engine.last_checked_synced_files = []
+            emulator.reset_stats()
+        durations = measure(func, ctx.repeat, setup=setup)
+        return durations, dict(emulator.stats)
+
+    for check_md5, refresh in [(False, False), (True, False), (False, True), (True, True)]:
+        label = f'md5={check_md5}, refresh={refresh}'
+        durations, stats = run(check_md5, refresh, engine.check_files)
+        results.append(summarize(f'check_files ({label})', durations, images, requests=stats))
+        durations, stats = run(check_md5, refresh, engine.upload_files)
+        results.append(summarize(f'upload_files no-op ({label})', durations, images, requests=stats))
+    return results
+
+
+def bench_sync_end_to_end(ctx):
+    """在有延迟、带宽限制和限流的模拟器上测试完整同步：首次全量上传和随后的无变化同步"""
+    options = EmulatorOptions(latency=ctx.latency, jitter=ctx.jitter, bandwidth=ctx.bandwidth,
+                              throttle_rate=ctx.throttle_rate, keep_data=False, seed=ctx.seed)
+    emulator = CosEmulator(options)
+    emulator.install()
+    engines = []
+
+    def setup():
+        _use_new_bucket(ctx, emulator)
+        engines[:] = [_new_engine(ctx)]
+        emulator.reset_stats()
+
+    repeat = max(1, min(ctx.repeat, 3))
+    first_stats = []
+
+    def first_sync():
+        engines[0].upload_files()
+        first_stats.append(dict(emulator.stats))
+
+    first = measure(first_sync, repeat, setup=setup)
+
+    def noop_setup():
+        engines[:] = [_new_engine(ctx)]
+        emulator.reset_stats()
+
+    noop = measure(lambda: engines[0].upload_files(), repeat, setup=noop_setup)
+    images, total_bytes = len(ctx.vault.images), ctx.vault.total_image_bytes
+    return [summarize('sync end-to-end (full upload)', first, images, total_bytes,
+                      emulator=options._asdict(), requests=first_stats[-1]),
+            summarize('sync end-to-end (no changes)', noop, images, requests=dict(emulator.stats))]
@@ -0,0 +1,156 @@
+"""运行基准测试并输出JSON结果，用于对比性能改动前后的数据
+
+    python -m benchmarks.run                                  默认规模(500笔记/1000图片)运行全部测试
+    python -m benchmarks.run --notes 50 --images 100 -r 3     小规模快速运行
+    python -m benchmarks.run --only md5sum,sync_end_to_end    只运行指定的测试
+    python -m benchmarks.run --latency 30 --bandwidth 10 -o result.json
+
+测试在临时目录中生成仓库并使用独立的用户目录，不会读写真实的配置、索引和COS。
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import NamedTuple
+
+from benchmarks.vault_generator import VaultSpec, generate_vault, GeneratedVault
+
+BENCHMARKS = ['find_ob_imgs', 'scan_notes', 'update_ob_file', 'get_encoding', 'md5sum', 'hash_cache',
+              'check_and_plan', 'sync_end_to_end']
+
+
+class BenchContext(NamedTuple):
+    vault: GeneratedVault
+    workdir: str
+    repeat: int
+    workers: int
+    seed: int
+    latency: float
+    jitter: float
+    bandwidth: int
+    throttle_rate: float
+
+
+def _load_benchmarks():
+    """在设置好用户目录之后再导入，src.env在导入时确定配置和索引路径"""
+    from benchmarks import bench_notes, bench_files, bench_sync
+
+    return {
+        'find_ob_imgs': bench_notes.bench_find_ob_imgs,
+        'scan_notes': bench_notes.bench_scan_notes,
+        'update_ob_file': bench_notes.bench_update_ob_file,
+        'get_encoding': bench_notes.bench_get_encoding,
+        'md5sum': bench_files.bench_md5sum,
+        'hash_cache': bench_files.bench_hash_cache,
+        'check_and_plan': bench_sync.bench_check_and_plan,
+        'sync_end_to_end': bench_sync.bench_sync_end_to_end,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except Exception:
+        return None
+
+
+def _format_result(result: dict):
+    text = f'{result["name"]:<45} p50 {result["p50_s"] * 1000:>10.2f}ms  p95 {result["p95_s"] * 1000:>10.2f}ms'
+    if result.get('items_per_s'):
+        text += f'  {result["items_per_s"]:>10.1f} items/s'
+    if result.get('bytes_per_s'):
+        text += f'  {result["bytes_per_s"] / 1024 / 1024:>8.1f} MB/s'
+    return text
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.run', description='Obsidian图片上传工具基准测试')
+    spec = VaultSpec()
+    parser.add_argument('--notes', type=int, default=spec.notes, help='笔记数量')
+    parser.add_argument('--images', type=int, default=spec.images, help='附件图片数量')
+    parser.add_argument('--embeds', type=int, default=spec.embeds_per_note, help='每个笔记引用的图片数量')
+    parser.add_argument('--lines', type=int, default=spec.lines_per_note, help='每个笔记的行数')
+    parser.add_argument('--image-kb', type=int, default=spec.image_kb, help='图片平均大小(KB)')
+    parser.add_argument('--gbk-ratio', type=float, default=spec.gbk_ratio, help='GBK编码笔记的比例')
+    parser.add_argument('--seed', type=int, default=spec.seed, help='随机种子')
+    parser.add_argument('-r', '--repeat', type=int, default=5, help='每项测试的重复次数(端到端同步最多3次)')
+    parser.add_argument('--workers', type=int, default=8, help='上传和扫描笔记的并发数')
+    parser.add_argument('--latency', type=float, default=20, help='模拟COS每个请求的延迟(毫秒)')
+    parser.add_argument('--jitter', type=float, default=10, help='模拟COS的随机额外延迟上限(毫秒)')
+    parser.add_argument('--bandwidth', type=float, default=20, help='模拟COS的带宽(MB/s)，0表示不限')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='模拟COS请求被限流的概率')
+    parser.add_argument('--only', default='', help=f'只运行指定的测试，逗号分隔，可选: {",".join(BENCHMARKS)}')
+    parser.add_argument('-o', '--output', default=None, help='JSON结果文件路径，默认只打印到终端')
+    parser.add_argument('--workdir', default=None, help='工作目录，默认使用临时目录并在结束后删除')
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    selected = [name.strip() for name in args.only.split(',') if name.strip()] or BENCHMARKS
+    unknown = [name for name in selected if name not in BENCHMARKS]
+    if unknown:
+        print(f'未知的测试: {",".join(unknown)}', file=sys.stderr)
+        return 2
+
+    tmp_dir = None
+    if args.workdir:
+        workdir = os.path.abspath(args.workdir)
+        os.makedirs(workdir, exist_ok=True)
+    else:
+        tmp_dir = tempfile.TemporaryDirectory(prefix='obsidian-img-bench-')
+        workdir = tmp_dir.name
+    home = os.path.join(workdir, 'home')
+    os.makedirs(home, exist_ok=True)
+    os.environ['HOME'] = os.environ['USERPROFILE'] = home
+
+    from loguru import logger as log
+    log.remove()
+    log.add(sink=sys.stderr, level='ERROR', format='{level: <8} | {message}')
+
+    try:
+        spec = VaultSpec(args.notes, args.images, args.embeds, args.lines, args.image_kb, args.gbk_ratio, args.seed)
+        start = time.perf_counter()
+        vault = generate_vault(workdir, spec)
+        print(f'生成仓库: {len(vault.notes)}个笔记, {len(vault.images)}张图片 '
+              f'({vault.total_image_bytes / 1024 / 1024:.1f}MB), 耗时{time.perf_counter() - start:.1f}s')
+
+        ctx = BenchContext(vault, workdir, args.repeat, args.workers, args.seed, args.latency / 1000,
+                           args.jitter / 1000, int(args.bandwidth * 1024 * 1024), args.throttle_rate)
+        benchmarks = _load_benchmarks()
+        results = []
+        for name in selected:
+            for result in benchmarks[name](ctx):
+                result['benchmark'] = name
+                results.append(result)
+                print(_format_result(result))
+    finally:
+        if tmp_dir is not None:
+            tmp_dir.cleanup()
+
+    report = {
+        'meta': {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'git_commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'params': {**spec._asdict(), 'repeat': args.repeat, 'workers': args.workers, 'latency_ms': args.latency,
+                   'jitter_ms': args.jitter, 'bandwidth_mb': args.bandwidth, 'throttle_rate': args.throttle_rate},
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f'结果已写入 {args.output}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,38 @@
+import statistics
+import time
+
+from pkg.utils.metrics import percentile
+
+
+def measure(func, repeat: int = 5, setup=None):
+    """重复运行func，返回每次的耗时(秒)，setup在每次计时前运行且不计时"""
+    durations = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def summarize(name: str, durations: list, items: int = None, num_bytes: int = None, **extra):
+    """汇总一项基准测试的结果，items和num_bytes为每次运行处理的数量和字节数"""
+    result = {
+        'name': name,
+        'repeat': len(durations),
+        'min_s': min(durations),
+        'mean_s': statistics.mean(durations),
+        'p50_s': percentile(durations, 50),
+        'p95_s': percentile(durations, 95),
+        'max_s': max(durations),
+    }
+    best = min(durations)
+    if items is not None:
+        result['items'] = items
+        result['items_per_s'] = items / best if best else None
+    if num_bytes is not None:
+        result['bytes'] = num_bytes
+        result['bytes_per_s'] = num_bytes / best if best else None
+    result.update(extra)
+    return result
@@ -0,0 +1,64 @@
+import os
+import random
+from typing import NamedTuple
+
+_WORDS = ['Obsidian', '笔记', 'markdown', '图片', 'sync', 'COS', '上传', 'vault', 'attachment', '性能',
+          'benchmark', '链接', 'python', '测试', 'image', '文件']
+
+
+class VaultSpec(NamedTuple):
+    """生成仓库的规模配置"""
+    notes: int = 500
+    images: int = 1000
+    embeds_per_note: int = 5
+    lines_per_note: int = 80
+    image_kb: int = 64  # 图片平均大小，实际大小在0.5~1.5倍之间随机
+    gbk_ratio: float = 0.05  # GBK编码笔记的比例，用于覆盖chardet检测路径
+    seed: int = 42
+
+
+class GeneratedVault(NamedTuple):
+    vault_path: str
+    attachment_path: str
+    notes: list
+    images: list
+    total_image_bytes: int
+    total_note_bytes: int
+
+
+def generate_vault(root: str, spec: VaultSpec = VaultSpec()):
+    """在root下生成一个Obsidian仓库：附件目录中的随机图片文件和引用这些图片的笔记"""
+    rnd = random.Random(spec.seed)
+    vault_path = os.path.join(root, 'vault')
+    attachment_path = os.path.join(vault_path, 'attachments')
+    os.makedirs(attachment_path, exist_ok=True)
+
+    images = []
+    total_image_bytes = 0
+    for i in range(spec.images):
+        name = f'Pasted image {i:06d}.png'
+        size = max(1, int(spec.image_kb * 1024 * rnd.uniform(0.5, 1.5)))
+        with open(os.path.join(attachment_path, name), 'wb') as f:
+            f.write(rnd.randbytes(size))
+        images.append(os.path.join(attachment_path, name).replace('\\', '/'))
+        total_image_bytes += size
+
+    notes = []
+    total_note_bytes = 0
+    for i in range(spec.notes):
+        note_dir = os.path.join(vault_path, f'folder{i % 10}')
+        os.makedirs(note_dir, exist_ok=True)
+        note_path = os.path.join(note_dir, f'note {i:06d}.md')
+        embed_lines = set(rnd.sample(range(spec.lines_per_note), min(spec.embeds_per_note, spec.lines_per_note)))
+        lines = [f'# Note {i}\n']
+        for line_no in range(spec.lines_per_note):
+            text = ' '.join(rnd.choice(_WORDS) for _ in range(rnd.randint(5, 20)))
+            if line_no in embed_lines and images:
+                text += f' ![[{os.path.basename(rnd.choice(images))}]]'
+            lines.append(text + '\n')
+        encoding = 'gbk' if rnd.random() < spec.gbk_ratio else 'utf-8'
+        with open(note_path, 'w', encoding=encoding) as f:
+            f.writelines(lines)
+        notes.append(note_path)
+        total_note_bytes += os.path.getsize(note_path)
+    return GeneratedVault(vault_path, attachment_path, notes, images, total_image_bytes, total_note_bytes)
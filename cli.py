@@ -0,0 +1,222 @@
+"""命令行入口，不依赖Qt，可在无图形界面的服务器或定时任务中使用
+
+    python cli.py sync [--md5] [--refresh]      上传附件目录中的图片，存在上传失败的文件时返回1
+    python cli.py check [--md5] [--refresh]     检查附件同步状态，存在未同步文件时返回1
+    python cli.py verify [--refresh]            强制MD5校验附件同步状态
+    python cli.py convert NOTE... | --vault     上传笔记引用的图片并改写笔记，存在失败时返回1
+    python cli.py refs IMAGE...                 列出仓库中引用了指定附件的笔记，都没有被引用时返回1
+    python cli.py watch [--sync] [--refresh]    监听附件目录并自动上传新增或修改的图片，收到SIGINT/SIGTERM时停止
+"""
+import argparse
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+
+from loguru import logger as log
+
+from pkg.utils.better_logger import add_log_to_file
+from src.env import USER_HOME, APP_NAME
+
+
+def init_cli_logger(verbose: bool = False):
+    """命令行只在终端输出警告以上的日志，完整日志写入文件"""
+    log.remove()
+    log.add(sink=sys.stderr, level='INFO' if verbose else 'WARNING', format='{level: <8} | {message}')
+    add_log_to_file(os.path.join(USER_HOME, APP_NAME, 'logs'))
+
+
+def list_attachments(attachment_path: str):
+    """列出附件目录中的图片文件"""
+    from pkg.utils.file_tools import is_image_file
+
+    if not os.path.isdir(attachment_path):
+        raise FileNotFoundError(f'附件目录不存在: {attachment_path}')
+    return sorted(os.path.join(attachment_path, file).replace('\\', '/')
+                  for file in os.listdir(attachment_path) if is_image_file(file))
+
+
+def create_engine(args):
+    """创建同步引擎，日志消息直接打印到终端"""
+    from src.sync_engine import SyncEngine
+
+    engine = SyncEngine()
+    engine.console_log_text.connect(print)
+    engine.run_metrics.connect(lambda report: print(report['summary']))
+    engine.check_md5 = getattr(args, 'md5', False)
+    engine.refresh_remote = args.refresh
+    return engine
+
+
+def read_config():
+    from src.config_loader import ConfigLoader
+
+    return ConfigLoader().read_config()
+
+
+def cmd_sync(args):
+    local_files = list_attachments(read_config().obsidian.attachment_path)
+    if not local_files:
+        print('附件目录中没有图片文件')
+        return 0
+    engine = create_engine(args)
+    engine.local_files = local_files
+    failed = engine.upload_files()
+    if failed:
+        print(f'{len(failed)}/{len(local_files)}个文件上传失败', file=sys.stderr)
+    return 1 if failed else 0
+
+
+def cmd_check(args):
+    local_files = list_attachments(read_config().obsidian.attachment_path)
+    if not local_files:
+        print('附件目录中没有图片文件')
+        return 0
+    engine = create_engine(args)
+    engine.local_files = local_files
+    return 0 if engine.check_files() else 1
+
+
+def cmd_verify(args):
+    args.md5 = True
+    return cmd_check(args)
+
+
+def cmd_convert(args):
+    config = read_config()
+    if args.vault:
+        engine = create_engine(args)
+        engine.convert_suffix = '' if args.overwrite else args.suffix or engine.convert_suffix
+        return 0 if engine.convert_vault() else 1
+
+    from src.obsidian import scan_notes
+    from pkg.utils.file_tools import is_image_file
+
+    note_imgs = scan_notes(args.notes, config.obsidian.convert_workers)
+    unreadable = len(set(args.notes) - set(note_imgs))
+    if unreadable:
+        print(f'{unreadable}个笔记无法读取，已跳过', file=sys.stderr)
+    img_root = config.obsidian.attachment_path
+    images = sorted({img for imgs in note_imgs.values() for img in imgs if is_image_file(img)})
+    local_files = [os.path.join(img_root, img).replace('\\', '/') for img in images
+                   if os.path.isfile(os.path.join(img_root, img))]
+    if not local_files:
+        print(f'{len(note_imgs)}个笔记中没有附件目录中的图片')
+        return 1 if unreadable else 0
+    engine = create_engine(args)
+    engine.convert_suffix = '' if args.overwrite else args.suffix or engine.convert_suffix
+    engine.local_files = local_files
+    return 0 if engine.convert_notes(note_imgs) == 0 and not unreadable else 1
+
+
+def cmd_refs(args):
+    from src.env import VAULT_INDEX_PATH
+    from src.vault_index import VaultIndex
+
+    config = read_config()
+    vault_path = config.obsidian.vault_path
+    if not os.path.isdir(vault_path):
+        raise FileNotFoundError(f'Obsidian仓库不存在: {vault_path}')
+    vault_index = VaultIndex(VAULT_INDEX_PATH)
+    vault_index.update(vault_path, config.obsidian.convert_workers)
+    referenced = False
+    for image in args.images:
+        notes = vault_index.notes_referencing(vault_path, os.path.basename(image))
+        print(f'{image}: {len(notes)}个笔记引用')
+        for note in notes:
+            print(f'    {note}')
+        referenced = referenced or bool(notes)
+    return 0 if referenced else 1
+
+
+def cmd_watch(args):
+    from src.watcher import AttachmentWatcher
+
+    config = read_config()
+    attachment_path = config.obsidian.attachment_path
+    if not os.path.isdir(attachment_path):
+        raise FileNotFoundError(f'附件目录不存在: {attachment_path}')
+    engine = create_engine(args)
+    engine.connect_bucket_dir()  # 配置错误时直接退出，而不是在每批变化时报错
+    if args.sync:
+        local_files = list_attachments(attachment_path)
+        if local_files:
+            engine.local_files = local_files
+            engine.upload_files()
+
+    stop_event = threading.Event()
+
+    def stop(signum, frame):
+        log.info(f'Receive signal {signum}, stop watching')
+        stop_event.set()
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    watcher = AttachmentWatcher(attachment_path, engine.upload_changed_files,
+                                debounce=config.uploader.watch_debounce,
+                                poll_interval=config.uploader.watch_poll_interval)
+    watcher.start()
+    print(f'正在自动同步新附件: {attachment_path}，按Ctrl+C停止')
+    try:
+        while not stop_event.wait(1):  # 带超时等待，主线程才能及时处理信号
+            pass
+    finally:
+        watcher.stop()  # 等待正在上传的一批文件完成
+    print('已停止自动同步新附件')
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='obsidian-img-uploader', description='Obsidian图片上传工具(命令行)')
+    parser.add_argument('-v', '--verbose', action='store_true', help='在终端输出INFO级别日志')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    for name, func, help_text in [('sync', cmd_sync, '上传附件目录中的图片'),
+                                  ('check', cmd_check, '检查附件同步状态')]:
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument('--md5', action='store_true', help='校验远程同名文件的MD5')
+        sub.add_argument('--refresh', action='store_true', help='从COS刷新远程文件索引')
+        sub.set_defaults(func=func)
+
+    verify = subparsers.add_parser('verify', help='强制MD5校验附件同步状态')
+    verify.add_argument('--refresh', action='store_true', help='从COS刷新远程文件索引')
+    verify.set_defaults(func=cmd_verify)
+
+    convert = subparsers.add_parser('convert', help='上传笔记引用的图片并改写笔记')
+    convert.add_argument('notes', nargs='*', help='需要转换的笔记文件')
+    convert.add_argument('--vault', action='store_true', help='转换配置中的整个Obsidian仓库')
+    convert.add_argument('--overwrite', action='store_true', help='直接覆盖原笔记')
+    convert.add_argument('--suffix', default=None, help='新笔记文件名后缀，默认使用配置中的后缀')
+    convert.add_argument('--md5', action='store_true', help='校验远程同名文件的MD5')
+    convert.add_argument('--refresh', action='store_true', help='从COS刷新远程文件索引')
+    convert.set_defaults(func=cmd_convert)
+
+    refs = subparsers.add_parser('refs', help='列出仓库中引用了指定附件的笔记')
+    refs.add_argument('images', nargs='+', help='附件文件名或路径')
+    refs.set_defaults(func=cmd_refs)
+
+    watch = subparsers.add_parser('watch', help='监听附件目录并自动上传新增或修改的图片')
+    watch.add_argument('--sync', action='store_true', help='开始监听前先上传附件目录中的全部图片')
+    watch.add_argument('--refresh', action='store_true', help='从COS刷新远程文件索引')
+    watch.set_defaults(func=cmd_watch)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == 'convert' and not args.vault and not args.notes:
+        parser.error('convert需要指定笔记文件或--vault')
+    init_cli_logger(args.verbose)
+    try:
+        return args.func(args)
+    except Exception as e:
+        log.error(f'{args.command} failed, detail: {str(e)}')
+        print(f'执行失败: {str(e)}', file=sys.stderr)
+        return 2
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    sys.exit(main())
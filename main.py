@@ -1,3 +1,4 @@
+import multiprocessing
 import os
 import sys
 
@@ -10,6 +11,7 @@ from src.env import USER_HOME, APP_NAME, show_env
 
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()  # 打包后的程序需要支持转换笔记时使用的进程池
     show_env()
     init_logger(os.path.join(USER_HOME, APP_NAME, 'logs'))
     app = QApplication(sys.argv)
@@ -0,0 +1,67 @@
+import threading
+import time
+
+from loguru import logger as log
+
+
+class _Call(object):
+    """进行中的一次请求，等待者共享其结果"""
+    __slots__ = ('event', 'value', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class AccountMetadataCache(object):
+    """账号级元数据(如存储桶列表)的TTL缓存
+
+    同一个key的并发请求只会真正发起一次(single-flight)，其余调用等待并共享结果；请求失败时不缓存。
+    缓存的值由多个调用方共享，不要修改。
+    """
+
+    def __init__(self, ttl: float = 300):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}  # {key: (过期时间, 值)}
+        self._inflight = {}  # {key: _Call}
+
+    def get(self, key, loader):
+        """获取缓存的值，过期或不存在时调用loader()加载"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                return entry[1]
+            call = self._inflight.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self._inflight[key] = _Call()
+
+        if not is_leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = loader()
+            with self._lock:
+                self._entries[key] = (time.monotonic() + self.ttl, call.value)
+            return call.value
+        except Exception as e:
+            call.error = e
+            log.warning(f'Load account metadata failed, detail: {str(e)}')
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            call.event.set()
+
+    def invalidate(self, key=None):
+        """使指定key(为空时全部)的缓存失效，例如新建或删除存储桶之后"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
@@ -0,0 +1,88 @@
+import threading
+from typing import NamedTuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from loguru import logger as log
+from qcloud_cos import CosConfig, CosS3Client
+
+
+class ClientPoolOptions(NamedTuple):
+    """连接池配置，pool_maxsize应不小于同时上传的线程数，否则多余的连接用完即被丢弃，需要重新TLS握手"""
+    pool_connections: int = 10  # 缓存的主机(地区/存储桶域名)连接池数量
+    pool_maxsize: int = 32  # 每个主机保持的最大连接数
+    keep_alive: bool = True
+    timeout: int = None
+    retry: int = 3
+
+
+def default_client_factory(secret_id: str, secret_key: str, region: str,
+                           options: ClientPoolOptions, session: requests.Session):
+    """创建使用共享HTTP会话的CosS3Client"""
+    cos_config = CosConfig(SecretId=secret_id, SecretKey=secret_key, Region=region, Token=None,
+                           Scheme='https', Timeout=options.timeout, KeepAlive=options.keep_alive,
+                           PoolConnections=options.pool_connections, PoolMaxSize=options.pool_maxsize)
+    return CosS3Client(cos_config, retry=options.retry, session=session)
+
+
+class CosClientPool(object):
+    """按(SecretId, SecretKey, 地区)共享的CosS3Client池
+
+    所有客户端共用一个requests.Session，同一主机的keep-alive连接和TLS会话可以在
+    ImageServer、Uploader和各上传线程之间复用。factory可以替换为其他实现(如本地模拟器)。
+    """
+
+    def __init__(self, options: ClientPoolOptions = ClientPoolOptions(), factory=default_client_factory):
+        self.options = options
+        self.factory = factory
+        self._lock = threading.Lock()
+        self._clients = {}
+        self._session = None
+
+    def _new_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.options.pool_connections,
+                              pool_maxsize=self.options.pool_maxsize)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def get_client(self, secret_id: str, secret_key: str, region: str):
+        """获取共享的客户端，不存在时创建"""
+        key = (secret_id, secret_key, region)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                if self._session is None:
+                    self._session = self._new_session()
+                client = self._clients[key] = self.factory(
+                    secret_id, secret_key, region, self.options, self._session)
+                log.info(f'Create cos client for region {region}, {len(self._clients)} clients in pool')
+            return client
+
+    def configure(self, options: ClientPoolOptions = None, factory=None):
+        """修改连接池配置或客户端工厂，发生变化时丢弃已有的客户端和连接并返回True"""
+        options = self.options if options is None else options
+        factory = self.factory if factory is None else factory
+        if options == self.options and factory is self.factory:
+            return False
+        with self._lock:
+            self.options = options
+            self.factory = factory
+            self._close()
+        log.info(f'Reconfigure cos client pool: {options}')
+        return True
+
+    def clear(self):
+        """关闭所有连接并清空客户端"""
+        with self._lock:
+            self._close()
+
+    def _close(self):
+        self._clients.clear()
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+
+CLIENT_POOL = CosClientPool()
@@ -1,38 +1,66 @@
-from qcloud_cos import CosConfig, CosS3Client, CosServiceError
+import hashlib
+
+from qcloud_cos import CosServiceError
 
 from loguru import logger as log
 
+from pkg.tencent_cos.account_cache import AccountMetadataCache
+from pkg.tencent_cos.client_pool import CLIENT_POOL
+
+# 同一账号的存储桶列表与地区在所有TencentCos实例间共享，5分钟内不重复请求
+ACCOUNT_METADATA = AccountMetadataCache(ttl=300)
+
 
 class TencentCos(object):
     """腾讯云COS接口类封装
     参考：https://cloud.tencent.com/document/product/436/12269
     """
 
-    def __init__(self, secret_id: str, secret_key: str, region: str = 'ap-chengdu'):
+    def __init__(self, secret_id: str, secret_key: str, region: str = 'ap-chengdu', appid: str = None):
         """secret_id和secret_key获取参考：
-        https://console.cloud.tencent.com/cam/capi"""
+        https://console.cloud.tencent.com/cam/capi
+        已知appid时不再请求存储桶列表"""
         self.secret_id = secret_id
         self.secret_key = secret_key
         self.region = region
         self.client = self.connect_client()
-        self._bucket_suffix = self.get_appid()
+        self._bucket_suffix = appid if appid else self.get_appid()
+
+    @property
+    def appid(self):
+        return self._bucket_suffix
 
     def connect_client(self, region=None):
-        """连接到COS服务"""
+        """连接到COS服务，相同账号和地区的客户端从连接池共享"""
         cos_region = self.region if region is None else region
-        cos_config = CosConfig(SecretId=self.secret_id, SecretKey=self.secret_key,
-                               Region=cos_region, Token=None, Scheme='https')
-        return CosS3Client(cos_config)
+        return CLIENT_POOL.get_client(self.secret_id, self.secret_key, cos_region)
+
+    def _account_key(self):
+        return self.secret_id, hashlib.md5(self.secret_key.encode()).hexdigest()
+
+    def _list_raw_buckets(self, refresh: bool = False):
+        """获取账号下的原始存储桶列表(含Name、Location)，使用账号级TTL缓存，并发请求只发起一次"""
+        if refresh:
+            ACCOUNT_METADATA.invalidate(self._account_key())
+        return ACCOUNT_METADATA.get(self._account_key(),
+                                    lambda: self.client.list_buckets()['Buckets']['Bucket'])
 
     def get_appid(self):
         """获取cos的APPID"""
-        demo_bucket = self.client.list_buckets()['Buckets']['Bucket'][0]
+        demo_bucket = self._list_raw_buckets()[0]
         return demo_bucket['Name'].split('-')[-1]
 
-    def list_buckets(self):
-        """获取无默认桶后缀名的cos桶列表"""
-        raw_buckets = self.client.list_buckets()
-        buckets = [bucket['Name'] for bucket in raw_buckets['Buckets']['Bucket']]
+    def get_bucket_region(self, bucket_name: str, refresh: bool = False):
+        """从存储桶列表的Location字段获取存储桶所在地区，找不到存储桶时返回None，refresh为True时忽略缓存"""
+        full_name = self._fmt_b_name(bucket_name)
+        for bucket in self._list_raw_buckets(refresh):
+            if bucket['Name'] == full_name:
+                return bucket.get('Location')
+        return None
+
+    def list_buckets(self, refresh: bool = False):
+        """获取无默认桶后缀名的cos桶列表，refresh为True时忽略缓存"""
+        buckets = [bucket['Name'] for bucket in self._list_raw_buckets(refresh)]
         return [b.replace(f'-{self._bucket_suffix}', '') for b in buckets]
 
     def create_bucket(self, bucket_name):
@@ -48,7 +76,7 @@ class TencentCos(object):
             return False, e.get_error_code()
 
         # 检测是否新建桶成功
-        after_created = self.list_buckets()
+        after_created = self.list_buckets(refresh=True)
         if bucket_name in after_created:
             return True, f'Create bucket {bucket_name} success，' \
                          f'current bucket list -> ({", ".join(after_created)})'
@@ -58,7 +86,7 @@ class TencentCos(object):
         try:
             self.client.delete_bucket(Bucket=self._fmt_b_name(bucket_name))
             success_msg = f'Delete bucket {bucket_name} success, ' \
-                          f'current bucket list -> ({", ".join(self.list_buckets())})'
+                          f'current bucket list -> ({", ".join(self.list_buckets(refresh=True))})'
             log.info(success_msg)
             return True, success_msg
         except CosServiceError as e:
@@ -1,70 +1,148 @@
+import base64
+import hashlib
+import math
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
 from urllib.parse import quote
 
 from loguru import logger as log
 from qcloud_cos import CosServiceError
 
 from pkg.tencent_cos.cos import TencentCos
-from pkg.tencent_cos.exceptions import CosBucketDirNotFoundError
+from pkg.tencent_cos.exceptions import CosBucketDirNotFoundError, CosBucketNotFoundError
+from pkg.tencent_cos.key_index import RemoteKeyIndex
+from pkg.tencent_cos.multipart import MB, MultipartCheckpoint, MultipartOptions
+from pkg.tencent_cos.region_cache import BucketRegionCache
 from pkg.utils.file_tools import get_file_md5sum
 
-REGIONS = ['nanjing', 'chengdu', 'beijing', 'guangzhou', 'shanghai', 'chongqing', 'hongkong']
+# 多对象删除接口单次请求最多1000个对象
+DELETE_BATCH_SIZE = 1000
+
+
+class ObjectProbe(NamedTuple):
+    """HEAD请求得到的对象元数据，metadata中为小写的x-cos-meta-*自定义头"""
+    key: str
+    exists: bool
+    size: int = None
+    etag: str = None
+    metadata: dict = None
 
 
 class TencentCosBucket(object):
     """腾讯云COS桶文件操作"""
 
-    def __init__(self, cos: TencentCos, bucket_name):
+    def __init__(self, cos: TencentCos, bucket_name, region_cache: BucketRegionCache = None):
         self.cos = cos
         self.name = bucket_name
-        self.full_name = bucket_name + '-' + self.cos.get_appid()
-        self.base_url = self.get_bucket_url()
+        self.region_cache = region_cache
+        self.multipart = MultipartOptions()
+        self.object_index = None  # 设置为CosObjectIndex后，删除对象时同步从本地索引中移除
+        self._region_lock = threading.Lock()
+        self._region_from_cache = False
         self.get_correct_cos_region()
 
     def get_bucket_url(self):
         """获取存储桶URL"""
         return 'https://' + self.full_name + '.cos.' + self.cos.region + '.myqcloud.com/'
 
-    def get_correct_cos_region(self):
-        """获取存储桶的正确地区配置"""
-        for region in REGIONS:
-            try:
-                self.cos.client.list_objects(Bucket=self.full_name)
+    def get_correct_cos_region(self, refresh: bool = False):
+        """获取存储桶的正确地区配置，优先读取地区缓存，否则从存储桶列表的Location字段获取并缓存
+
+        refresh为True时忽略地区缓存和存储桶列表缓存重新获取。
+        """
+        cached = self.region_cache.get(self.cos.secret_id, self.name) \
+            if self.region_cache and not refresh else None
+        self._region_from_cache = cached is not None
+        if cached is not None:
+            region, appid = cached['region'], cached['appid']
+        else:
+            region, appid = self.cos.get_bucket_region(self.name, refresh), self.cos.appid
+            if region is None:
+                raise CosBucketNotFoundError(f'Cannot find bucket: {self.name}')
+            if self.region_cache is not None:
+                self.region_cache.set(self.cos.secret_id, self.name, region, appid)
+        if region != self.cos.region or appid != self.cos.appid:
+            log.info(f'bucket {self.name} is in region {region}, switch from {self.cos.region}')
+            self.cos = TencentCos(self.cos.secret_id, self.cos.secret_key, region, appid=appid)
+        self.full_name = self.name + '-' + self.cos.appid
+        self.base_url = self.get_bucket_url()
+
+    def _refresh_stale_region(self, failed_cos: TencentCos):
+        """缓存的地区已失效(存储桶被删除或在其他地区重建)时删除缓存并重新获取地区，返回是否需要重试请求"""
+        with self._region_lock:
+            if self.cos is not failed_cos:  # 其他线程已经重新获取了地区
+                return True
+            if not self._region_from_cache:
+                return False
+            log.warning(f'Cached region {self.cos.region} of bucket {self.name} is stale, resolve again')
+            self.region_cache.remove(self.cos.secret_id, self.name)
+            self.get_correct_cos_region(refresh=True)
+            return self.cos is not failed_cos
+
+    def _request(self, method: str, **kwargs):
+        """调用当前存储桶的COS接口，遇到NoSuchBucket且地区来自缓存时重新获取地区并重试一次"""
+        cos = self.cos
+        try:
+            return getattr(cos.client, method)(Bucket=self.full_name, **kwargs)
+        except CosServiceError as e:
+            if e.get_error_code() != 'NoSuchBucket' or not self._refresh_stale_region(cos):
+                raise
+        body = kwargs.get('Body')
+        if hasattr(body, 'seek'):
+            body.seek(0)
+        return getattr(self.cos.client, method)(Bucket=self.full_name, **kwargs)
+
+    def iter_object_pages(self, prefix: str = '', max_keys: int = 1000):
+        """按页列出远程对象，跟随Marker自动翻页，每次产出一页原始的Contents列表"""
+        marker = ''
+        while True:
+            response = self._request('list_objects', Prefix=prefix, Marker=marker, MaxKeys=max_keys)
+            contents = response.get('Contents', [])
+            if contents:
+                yield contents
+            if response.get('IsTruncated') != 'true' or not contents:
                 break
-            except CosServiceError as e:
-                if e.get_error_code() == 'NoSuchBucket':
-                    log.warning(f'bucket {self.name} not in region '
-                                f'{self.cos.region}, try another region')
-                    region = f'ap-{region}'
-                    self.cos = TencentCos(self.cos.secret_id, self.cos.secret_key, region)
-                    self.full_name = self.name + '-' + self.cos.get_appid()
-                    continue
-            except Exception as e:
-                log.error(f'Fatal: {str(e)}')
+            marker = response.get('NextMarker') or contents[-1]['Key']
+
+    def iter_objects(self, prefix: str = ''):
+        """流式列出远程对象/文件，产出去掉prefix后的对象名"""
+        for page in self.iter_object_pages(prefix):
+            for content in page:
+                yield content['Key'][len(prefix):]
 
     def list_objects(self, prefix: str = ''):
         """列出远程对象/文件"""
-        response = self.cos.client.list_objects(Bucket=self.full_name, Prefix=prefix)
-        if 'Contents' in response:
-            return [c['Key'].replace(prefix, '') for c in response['Contents']]
-        else:
+        objects = list(self.iter_objects(prefix))
+        if not objects:
             log.warning(f'Cannot find any objects in bucket {self.name}')
-            return []
+        return objects
+
+    def get_key_index(self, prefix: str = ''):
+        """流式列出远程对象并构建内存索引(对象名去掉prefix)，用于O(1)判断对象是否存在"""
+        return RemoteKeyIndex(self.iter_objects(prefix))
 
     def list_dirs(self):
         """列出所有远程文件夹"""
-        return [ob[:-1] for ob in self.list_objects() if ob.endswith('/')]
+        return self.get_key_index().dirs()
 
     def list_files(self):
         """列出所有远程文件"""
-        return [ob for ob in self.list_objects() if not ob.endswith('/')]
+        return self.get_key_index().files()
+
+    def is_dir_exists(self, remote_dir: str):
+        """检查远程文件夹是否存在，只请求一页且最多一个对象"""
+        if not remote_dir.endswith('/'):
+            remote_dir += '/'
+        return next(self.iter_object_pages(prefix=remote_dir, max_keys=1), None) is not None
 
     def list_dir_files(self, remote_dir: str):
         """列出特定文件夹下远程文件"""
         if remote_dir not in ['', '/']:
             if not remote_dir.endswith('/'):
                 remote_dir += '/'
-            if remote_dir[:-1] not in self.list_dirs():
+            if not self.is_dir_exists(remote_dir):
                 raise CosBucketDirNotFoundError(f'Bucket dir {remote_dir} not found.')
         return self.list_objects(prefix=remote_dir)
 
@@ -73,8 +151,8 @@ class TencentCosBucket(object):
         if not dir_path.endswith('/'):
             dir_path += '/'
         try:
-            self.cos.client.put_object(
-                Bucket=self.full_name,
+            self._request(
+                'put_object',
                 Body=b'',
                 Key=dir_path
             )
@@ -83,43 +161,159 @@ class TencentCosBucket(object):
             log.error(str(e))
             return False
 
-    def upload_object(self, local_path, remote_path: str = '', overwrite=True):
-        """上传单个对象"""
-        object_key = local_path.split('/')[-1]
+    def upload_object(self, local_path, remote_path: str = '', overwrite=True,
+                      md5sum: str = None, progress_callback=None,
+                      object_key: str = None, metadata_md5: str = None):
+        """上传单个对象，文件大小超过self.multipart.threshold时使用可断点续传的分块上传
+
+        Args:
+            local_path: 本地文件路径
+            remote_path: 远程文件夹前缀
+            overwrite: 远程已存在同名对象时是否覆盖，不允许覆盖时先发起一次HEAD请求判断
+            md5sum: 调用方已知(如来自哈希缓存)的文件md5值，为空时重新计算
+            progress_callback: 上传进度回调，参数为本次新上传完成的字节数
+            object_key: 远程对象名，为空时使用本地文件名
+            metadata_md5: 记录到x-cos-meta-md5的值，为空时使用md5sum。
+                上传的是优化后的图片时，记录的是原图的md5以便与本地文件比对
+
+        Returns:
+            (是否成功, 信息)，成功时信息为远程对象的ETag，失败时为错误原因
+        """
+        object_key = local_path.split('/')[-1] if object_key is None else object_key
         if not os.path.exists(local_path):
             return False, f'local path: {local_path} doesnt exists'
-        if object_key in self.list_objects():
-            if not overwrite:
-                warning_msg = f'{object_key} already in {self.name}, skipped!'
-                log.warning(warning_msg)
-                return True, warning_msg
-            else:
-                log.warning(f'{object_key} already in {self.name}, overwrite!')
+        object_full_path = remote_path + object_key
+        if not overwrite:
+            probe = self.probe_object(object_full_path)
+            if probe.exists:
+                log.warning(f'{object_key} already in {self.name}, skipped!')
+                return True, probe.etag
+        if md5sum is None:
+            md5sum = get_file_md5sum(local_path)
+        metadata_md5 = md5sum if metadata_md5 is None else metadata_md5
+        file_size = os.path.getsize(local_path)
+        if file_size >= self.multipart.threshold:
+            return self._upload_object_multipart(
+                local_path, object_full_path, md5sum, progress_callback, metadata_md5)
         try:
             with open(local_path, 'rb') as f:
-                self.cos.client.put_object(
-                    Bucket=self.full_name,
+                response = self._request(
+                    'put_object',
                     Body=f,
-                    Key=remote_path + object_key,
+                    Key=object_full_path,
                     StorageClass='STANDARD',
-                    EnableMD5=True,
-                    Metadata={'x-cos-meta-md5': get_file_md5sum(local_path)}
+                    ContentMD5=base64.b64encode(bytes.fromhex(md5sum)).decode(),
+                    Metadata={'x-cos-meta-md5': metadata_md5}
                 )
             log.info(f'Upload {local_path} to {remote_path} Success!')
+            if progress_callback is not None:
+                progress_callback(file_size)
         except CosServiceError as e:
             return False, e.get_error_code()
         except Exception as e:
             return False, str(e)
 
-        return True, 'SUCCESS'
+        return True, response.get('ETag')
+
+    def _upload_object_multipart(self, local_path, object_full_path: str, md5sum: str,
+                                 progress_callback=None, metadata_md5: str = None):
+        """分块上传大文件：并发上传分块，断点记录已完成分块，中断后再次上传时从断点继续"""
+        file_size = os.path.getsize(local_path)
+        # COS要求分块不小于1MB且最多10000块
+        part_size = max(self.multipart.part_size, MB, math.ceil(file_size / 10000))
+        part_count = max(1, math.ceil(file_size / part_size))
+        checkpoint = MultipartCheckpoint(
+            self.multipart.checkpoint_dir, self.full_name, object_full_path, local_path)
+        lock = threading.Lock()
+
+        def upload_part(part_number: int):
+            with open(local_path, 'rb') as f:
+                f.seek((part_number - 1) * part_size)
+                data = f.read(part_size)
+            response = self._request(
+                'upload_part',
+                Key=object_full_path,
+                Body=data,
+                PartNumber=part_number,
+                UploadId=checkpoint.upload_id,
+                ContentMD5=base64.b64encode(hashlib.md5(data).digest()).decode()
+            )
+            with lock:
+                checkpoint.parts[part_number] = response['ETag']
+                checkpoint.save(part_size, md5sum)
+            if progress_callback is not None:
+                progress_callback(len(data))
+
+        try:
+            if checkpoint.load(part_size, md5sum):
+                uploaded_parts = self._list_uploaded_parts(object_full_path, checkpoint.upload_id)
+                if uploaded_parts is None:
+                    log.warning(f'Upload id of {object_full_path} expired, restart upload')
+                    checkpoint.upload_id = None
+                else:
+                    checkpoint.parts = uploaded_parts
+                    log.info(f'Resume upload {local_path}, '
+                             f'{len(uploaded_parts)}/{part_count} parts already uploaded')
+            if checkpoint.upload_id is None:
+                response = self._request(
+                    'create_multipart_upload',
+                    Key=object_full_path,
+                    StorageClass='STANDARD',
+                    Metadata={'x-cos-meta-md5': md5sum if metadata_md5 is None else metadata_md5}
+                )
+                checkpoint.upload_id = response['UploadId']
+                checkpoint.parts = {}
+                checkpoint.save(part_size, md5sum)
+
+            pending_parts = [n for n in range(1, part_count + 1) if n not in checkpoint.parts]
+            if progress_callback is not None and len(pending_parts) < part_count:
+                progress_callback(file_size - sum(
+                    min(part_size, file_size - (n - 1) * part_size) for n in pending_parts))
+            with ThreadPoolExecutor(max_workers=max(1, self.multipart.max_workers)) as executor:
+                list(executor.map(upload_part, pending_parts))
+
+            response = self._request(
+                'complete_multipart_upload',
+                Key=object_full_path,
+                UploadId=checkpoint.upload_id,
+                MultipartUpload={'Part': [{'PartNumber': n, 'ETag': checkpoint.parts[n]}
+                                          for n in range(1, part_count + 1)]}
+            )
+            checkpoint.remove()
+            log.info(f'Multipart upload {local_path} to {object_full_path} '
+                     f'({part_count} parts) Success!')
+        except CosServiceError as e:
+            return False, e.get_error_code()
+        except Exception as e:
+            return False, str(e)
+
+        return True, response.get('ETag')
+
+    def _list_uploaded_parts(self, object_full_path: str, upload_id: str):
+        """列出分块上传中已上传的分块 {PartNumber: ETag}，UploadId已失效时返回None"""
+        parts = {}
+        marker = 0
+        while True:
+            try:
+                response = self._request('list_parts', Key=object_full_path,
+                                         UploadId=upload_id, PartNumberMarker=marker)
+            except CosServiceError as e:
+                if e.get_status_code() == 404:
+                    return None
+                raise
+            for part in response.get('Part', []):
+                parts[int(part['PartNumber'])] = part['ETag']
+            if response.get('IsTruncated') != 'true':
+                return parts
+            marker = int(response['NextPartNumberMarker'])
 
     def download_object(self, remote_file_path, local_folder):
         """下载单个对象"""
         file_path, file_name = self.get_object_path_name(remote_file_path)
         local_file_path = os.path.join(local_folder, file_name)
         try:
-            self.cos.client.download_file(
-                Bucket=self.full_name,
+            self._request(
+                'download_file',
                 Key=remote_file_path,
                 DestFilePath=local_file_path
             )
@@ -130,16 +324,72 @@ class TencentCosBucket(object):
     def _delete_object(self, object_full_path: str):
         """删除指定路径对象"""
         log.warning(f'Bucket {self.name}, delete object: {object_full_path}')
-        self.cos.client.delete_object(
-            Bucket=self.full_name,
+        self._request(
+            'delete_object',
             Key=object_full_path
         )
+        self._remove_from_index([object_full_path])
+
+    def _remove_from_index(self, object_full_paths: list):
+        """从本地索引中移除已删除的对象，否则索引过期前同步时仍会认为对象存在而跳过上传"""
+        if self.object_index is not None and object_full_paths:
+            self.object_index.remove(self.full_name, object_full_paths)
+
+    def _delete_objects_batch(self, object_full_paths: list):
+        """通过一次多对象删除请求删除一批对象(最多1000个)，返回 {对象全路径: 失败原因}"""
+        try:
+            response = self._request(
+                'delete_objects',
+                Delete={'Object': [{'Key': key} for key in object_full_paths], 'Quiet': 'true'}
+            )
+        except CosServiceError as e:
+            return {key: e.get_error_code() for key in object_full_paths}
+        except Exception as e:
+            return {key: str(e) for key in object_full_paths}
+        failed = {error['Key']: error.get('Code') or error.get('Message')
+                  for error in response.get('Error', [])}
+        self._remove_from_index([key for key in object_full_paths if key not in failed])
+        return failed
+
+    def delete_objects(self, object_full_paths, max_workers: int = 4):
+        """批量删除对象，按每批1000个分组调用多对象删除接口，多批并发执行
+
+        Args:
+            object_full_paths: 对象全路径的可迭代对象，也可以是按页产出的对象全路径列表
+            max_workers: 并发删除的批次数
+
+        Returns:
+            (删除成功的对象数, {删除失败的对象全路径: 失败原因})
+        """
+        def batches():
+            batch = []
+            for item in object_full_paths:
+                for key in (item if isinstance(item, list) else [item]):
+                    batch.append(key)
+                    if len(batch) >= DELETE_BATCH_SIZE:
+                        yield batch
+                        batch = []
+            if batch:
+                yield batch
+
+        deleted, failed = 0, {}
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            futures = [(len(batch), executor.submit(self._delete_objects_batch, batch))
+                       for batch in batches()]
+            for batch_size, future in futures:
+                batch_failed = future.result()
+                deleted += batch_size - len(batch_failed)
+                failed.update(batch_failed)
+        for key, reason in failed.items():
+            log.error(f'Bucket {self.name}, delete object {key} failed, detail: {reason}')
+        log.warning(f'Bucket {self.name}, {deleted} objects deleted, {len(failed)} failed')
+        return deleted, failed
 
     def delete_object(self, remote_dir, object_key):
         """删除文件夹内的单个对象"""
         if not remote_dir.endswith('/') and remote_dir != '':
             remote_dir += '/'
-        if object_key not in self.list_dir_files(remote_dir):
+        if not self.is_object_exists(remote_dir + object_key):
             err_msg = f'{object_key} not found in {remote_dir}'
             log.error(err_msg)
             return False, err_msg
@@ -147,34 +397,48 @@ class TencentCosBucket(object):
             self._delete_object(remote_dir + object_key)
             return True, ''
 
-    def delete_dir_objects(self, remote_dir: str):
-        """删除文件夹内所有对象"""
-        for file in self.list_dir_files(remote_dir):
-            self._delete_object(file)
+    def delete_dir_objects(self, remote_dir: str, max_workers: int = 4):
+        """删除文件夹内所有对象，边分页列出边批量删除"""
+        if remote_dir not in ['', '/'] and not remote_dir.endswith('/'):
+            remote_dir += '/'
+        if remote_dir not in ['', '/'] and not self.is_dir_exists(remote_dir):
+            raise CosBucketDirNotFoundError(f'Bucket dir {remote_dir} not found.')
+        pages = ([c['Key'] for c in page] for page in self.iter_object_pages(remote_dir))
+        return self.delete_objects(pages, max_workers)
 
-    def delete_all_objects(self):
+    def delete_all_objects(self, max_workers: int = 4):
         """删除所有文件，清空存储桶"""
-        for obj in self.list_objects():
-            self._delete_object(obj)
+        pages = ([c['Key'] for c in page] for page in self.iter_object_pages())
+        result = self.delete_objects(pages, max_workers)
         log.warning(f'Bucket {self.name} all files has been deleted')
+        return result
 
     def is_object_exists(self, object_full_path: str):
-        return self.cos.client.object_exists(
-            Bucket=self.full_name,
-            Key=object_full_path
-        )
+        return self.probe_object(object_full_path).exists
 
     def get_object_md5hash(self, object_full_path: str):
         """获取文件md5哈希值 https://cloud.tencent.com/document/product/436/36427"""
-        response = self._get_object_info(object_full_path)
-        md5hash = response.get('x-cos-meta-md5')
+        probe = self.probe_object(object_full_path)
+        md5hash = probe.metadata.get('x-cos-meta-md5') if probe.exists else None
         log.info(f'Bucket file: {object_full_path}, md5: {md5hash}')
         return md5hash
 
+    def probe_object(self, object_full_path: str):
+        """一次HEAD请求获取对象是否存在、大小、ETag和自定义元数据，不读取对象内容"""
+        try:
+            response = self._get_object_info(object_full_path)
+        except CosServiceError as e:
+            if e.get_status_code() == 404:
+                return ObjectProbe(object_full_path, False, metadata={})
+            raise
+        metadata = {k.lower(): v for k, v in response.items() if k.lower().startswith('x-cos-meta-')}
+        return ObjectProbe(object_full_path, True, int(response.get('Content-Length', 0)),
+                           response.get('ETag'), metadata)
+
     def _get_object_info(self, object_full_path: str):
-        """获取对象元数据信息"""
-        return self.cos.client.get_object(
-            Bucket=self.full_name,
+        """获取对象元数据信息(HEAD请求)"""
+        return self._request(
+            'head_object',
             Key=object_full_path
         )
 
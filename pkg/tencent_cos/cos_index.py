@@ -0,0 +1,115 @@
+import os
+import sqlite3
+import threading
+import time
+
+from loguru import logger as log
+
+from pkg.tencent_cos.key_index import RemoteKeyIndex
+
+_MAX_CHAR = '\U0010ffff'
+
+
+class CosObjectIndex(object):
+    """COS桶远程对象的本地SQLite索引，记录对象的大小、ETag和自定义的x-cos-meta-md5"""
+
+    def __init__(self, db_path: str):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._init_tables()
+
+    def _init_tables(self):
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS objects ('
+                'bucket TEXT NOT NULL, key TEXT NOT NULL, size INTEGER, etag TEXT, md5 TEXT, '
+                'last_modified TEXT, generation INTEGER, PRIMARY KEY (bucket, key)) WITHOUT ROWID')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS refreshes ('
+                'bucket TEXT NOT NULL, prefix TEXT NOT NULL, refreshed_at REAL, '
+                'PRIMARY KEY (bucket, prefix))')
+
+    def refresh(self, cos_bucket, prefix: str = ''):
+        """从COS增量刷新指定前缀下的索引：逐页写入，ETag未变的对象保留已知md5，最后清除已不存在的对象
+
+        没有记录ETag的对象无法判断是否被其他客户端覆盖，不保留md5。
+        """
+        bucket = cos_bucket.full_name
+        generation = time.time_ns()
+        count = 0
+        for page in cos_bucket.iter_object_pages(prefix):
+            rows = [(bucket, c['Key'], int(c.get('Size', 0)), c.get('ETag'),
+                     c.get('LastModified'), generation) for c in page]
+            with self._lock, self._conn:
+                self._conn.executemany(
+                    'INSERT INTO objects (bucket, key, size, etag, last_modified, generation) '
+                    'VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (bucket, key) DO UPDATE SET '
+                    'md5 = CASE WHEN objects.etag = excluded.etag '
+                    'THEN objects.md5 ELSE NULL END, '
+                    'size = excluded.size, etag = excluded.etag, '
+                    'last_modified = excluded.last_modified, generation = excluded.generation',
+                    rows)
+            count += len(rows)
+        with self._lock, self._conn:
+            removed = self._conn.execute(
+                'DELETE FROM objects WHERE bucket = ? AND key >= ? AND key < ? '
+                'AND (generation IS NULL OR generation != ?)',
+                (bucket, prefix, prefix + _MAX_CHAR, generation)).rowcount
+            self._conn.execute(
+                'INSERT OR REPLACE INTO refreshes (bucket, prefix, refreshed_at) VALUES (?, ?, ?)',
+                (bucket, prefix, time.time()))
+        log.info(f'Refresh index of bucket {cos_bucket.name} prefix "{prefix}": '
+                 f'{count} objects, {removed} removed')
+        return count
+
+    def is_fresh(self, bucket: str, prefix: str = '', ttl: float = 3600):
+        """检查指定前缀的索引是否在ttl秒内刷新过"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT refreshed_at FROM refreshes WHERE bucket = ? AND prefix = ?',
+                (bucket, prefix)).fetchone()
+        return row is not None and time.time() - row[0] < ttl
+
+    def list_keys(self, bucket: str, prefix: str = ''):
+        """列出指定前缀下的对象名（去掉prefix），与TencentCosBucket.list_objects结果一致"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT key FROM objects WHERE bucket = ? AND key >= ? AND key < ? ORDER BY key',
+                (bucket, prefix, prefix + _MAX_CHAR)).fetchall()
+        return [row[0][len(prefix):] for row in rows]
+
+    def key_index(self, bucket: str, prefix: str = ''):
+        """构建指定前缀下对象名(去掉prefix)的内存索引"""
+        return RemoteKeyIndex(self.list_keys(bucket, prefix))
+
+    def get(self, bucket: str, key: str):
+        """获取单个对象的索引信息，不存在时返回None"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT size, etag, md5, last_modified FROM objects WHERE bucket = ? AND key = ?',
+                (bucket, key)).fetchone()
+        if row is None:
+            return None
+        return {'Key': key, 'Size': row[0], 'ETag': row[1], 'md5': row[2], 'LastModified': row[3]}
+
+    def upsert(self, bucket: str, key: str, size: int = None, etag: str = None, md5: str = None):
+        """上传成功后就地更新单个对象的索引，etag应为上传返回的ETag，以便之后的刷新判断对象是否变化"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT INTO objects (bucket, key, size, etag, md5) VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT (bucket, key) DO UPDATE SET size = excluded.size, '
+                'etag = excluded.etag, md5 = excluded.md5',
+                (bucket, key, size, etag, md5))
+
+    def remove(self, bucket: str, keys: list):
+        """从索引中删除对象"""
+        with self._lock, self._conn:
+            self._conn.executemany('DELETE FROM objects WHERE bucket = ? AND key = ?',
+                                   [(bucket, key) for key in keys])
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,388 @@
+import base64
+import hashlib
+import random
+import threading
+import time
+import uuid
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter
+from datetime import datetime, timezone
+from typing import NamedTuple
+
+from loguru import logger as log
+from qcloud_cos import CosServiceError
+
+_MAX_CHAR = '\U0010ffff'
+
+
+class EmulatorOptions(NamedTuple):
+    """模拟器配置
+
+    latency: 每个请求的固定延迟(秒)，jitter为额外的随机延迟上限
+    bandwidth: 上传/下载共享的带宽上限(字节/秒)，0表示不限
+    throttle_rate: 请求被限流(503 SlowDown)的概率
+    max_retries: 客户端遇到限流时的重试次数，与CosS3Client默认的retry=3一致
+    keep_data: 是否保存对象内容，大规模压测时可以关闭，只记录大小和md5
+    """
+    latency: float = 0.0
+    jitter: float = 0.0
+    bandwidth: int = 0
+    throttle_rate: float = 0.0
+    max_retries: int = 3
+    keep_data: bool = True
+    seed: int = None
+
+
+class _StoredObject(object):
+    __slots__ = ('size', 'etag', 'data', 'metadata', 'last_modified')
+
+    def __init__(self, size, etag, data, metadata):
+        self.size = size
+        self.etag = etag
+        self.data = data
+        self.metadata = metadata
+        self.last_modified = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+
+
+class _Bucket(object):
+    """模拟的存储桶，对象名同时保存在字典和有序列表中，便于按前缀分页列出"""
+
+    def __init__(self, location: str):
+        self.location = location
+        self.created = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+        self.objects = {}
+        self.keys = []
+        self.uploads = {}  # {UploadId: (Key, Metadata, {PartNumber: (ETag, data)})}
+
+    def put(self, key: str, obj: _StoredObject):
+        if key not in self.objects:
+            insort(self.keys, key)
+        self.objects[key] = obj
+
+    def remove(self, key: str):
+        if self.objects.pop(key, None) is not None:
+            del self.keys[bisect_left(self.keys, key)]
+            return True
+        return False
+
+
+class _BandwidthLimiter(object):
+    """所有客户端共享的带宽，按字节数排队占用传输时间"""
+
+    def __init__(self, rate: int):
+        self.rate = rate
+        self._lock = threading.Lock()
+        self._next_free = 0.0
+
+    def transfer(self, num_bytes: int):
+        if not self.rate or not num_bytes:
+            return
+        with self._lock:
+            start = max(time.monotonic(), self._next_free)
+            self._next_free = start + num_bytes / self.rate
+            finish = self._next_free
+        time.sleep(max(0.0, finish - time.monotonic()))
+
+
+class _Body(object):
+    """get_object返回的Body，与SDK一样支持get_raw_stream().read()"""
+
+    def __init__(self, data: bytes):
+        self._data = data
+
+    def get_raw_stream(self):
+        return self
+
+    def read(self, *args):
+        return self._data
+
+    def get_stream_to_file(self, file_path: str):
+        with open(file_path, 'wb') as f:
+            f.write(self._data)
+
+
+class CosEmulator(object):
+    """进程内的腾讯云COS模拟后端，实现本项目用到的接口子集
+
+    支持存储桶列表、分页列出对象、上传、HEAD、下载、删除、多对象删除和分块上传，
+    可以配置每个请求的延迟、共享带宽上限和随机限流错误，用于在没有真实账号时测试和压测同步流程。
+    通过client_factory接入CosClientPool后，TencentCos/TencentCosBucket无需任何修改即可使用。
+    """
+
+    def __init__(self, options: EmulatorOptions = EmulatorOptions(), appid: str = '1250000000'):
+        self.options = options
+        self.appid = appid
+        self.buckets = {}
+        self.stats = Counter()
+        self._lock = threading.Lock()
+        self._random = random.Random(options.seed)
+        self._bandwidth = _BandwidthLimiter(options.bandwidth)
+
+    def create_bucket(self, bucket_name: str, region: str = 'ap-chengdu'):
+        """创建存储桶，bucket_name不带APPID后缀，返回带后缀的全名"""
+        full_name = f'{bucket_name}-{self.appid}'
+        with self._lock:
+            self.buckets.setdefault(full_name, _Bucket(region))
+        return full_name
+
+    def client_factory(self, secret_id: str, secret_key: str, region: str, options=None, session=None):
+        """与CosClientPool的客户端工厂签名一致"""
+        return EmulatedCosClient(self, region)
+
+    def install(self):
+        """让全局连接池创建的客户端都指向本模拟器，并清空账号元数据缓存"""
+        from pkg.tencent_cos.client_pool import CLIENT_POOL
+        from pkg.tencent_cos.cos import ACCOUNT_METADATA
+
+        CLIENT_POOL.configure(factory=self.client_factory)
+        CLIENT_POOL.clear()
+        ACCOUNT_METADATA.invalidate()
+        log.info(f'Install cos emulator: {self.options}')
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats.clear()
+
+    def _request(self, method: str, resource: str, bytes_in: int = 0):
+        """模拟一次请求的延迟、限流和上传带宽，限流时按max_retries重试"""
+        for attempt in range(self.options.max_retries + 1):
+            with self._lock:
+                self.stats[method] += 1
+                delay = self.options.latency + self._random.uniform(0, self.options.jitter)
+                throttled = self._random.random() < self.options.throttle_rate
+                if throttled:
+                    self.stats['throttled'] += 1
+            if delay:
+                time.sleep(delay)
+            if not throttled:
+                self._bandwidth.transfer(bytes_in)
+                with self._lock:
+                    self.stats['bytes_in'] += bytes_in
+                return
+        raise self._error(method, 503, 'SlowDown', 'Please reduce your request rate.', resource)
+
+    def _download(self, num_bytes: int):
+        self._bandwidth.transfer(num_bytes)
+        with self._lock:
+            self.stats['bytes_out'] += num_bytes
+
+    @staticmethod
+    def _error(method: str, status_code: int, code: str, message: str, resource: str):
+        return CosServiceError(method, {'code': code, 'message': message, 'resource': resource,
+                                        'requestid': uuid.uuid4().hex, 'traceid': ''}, status_code)
+
+    def _bucket(self, method: str, bucket: str):
+        try:
+            return self.buckets[bucket]
+        except KeyError:
+            raise self._error(method, 404, 'NoSuchBucket', 'The specified bucket does not exist.', bucket)
+
+
+def _read_body(body):
+    if isinstance(body, (bytes, bytearray)):
+        return bytes(body)
+    if isinstance(body, str):
+        return body.encode()
+    return body.read()
+
+
+class EmulatedCosClient(object):
+    """模拟的CosS3Client，参数名与SDK保持一致"""
+
+    def __init__(self, emulator: CosEmulator, region: str):
+        self.emulator = emulator
+        self.region = region
+
+    def list_buckets(self, **kwargs):
+        self.emulator._request('GET', 'service')
+        with self.emulator._lock:
+            buckets = [{'Name': name, 'Location': bucket.location, 'CreationDate': bucket.created}
+                       for name, bucket in sorted(self.emulator.buckets.items())]
+        return {'Buckets': {'Bucket': buckets}}
+
+    def bucket_exists(self, Bucket, **kwargs):
+        self.emulator._request('HEAD', Bucket)
+        return Bucket in self.emulator.buckets
+
+    def create_bucket(self, Bucket, **kwargs):
+        self.emulator._request('PUT', Bucket)
+        with self.emulator._lock:
+            if Bucket in self.emulator.buckets:
+                raise self.emulator._error('PUT', 409, 'BucketAlreadyExists', 'Bucket already exists.', Bucket)
+            self.emulator.buckets[Bucket] = _Bucket(self.region)
+
+    def delete_bucket(self, Bucket, **kwargs):
+        self.emulator._request('DELETE', Bucket)
+        with self.emulator._lock:
+            bucket = self.emulator._bucket('DELETE', Bucket)
+            if bucket.objects:
+                raise self.emulator._error('DELETE', 409, 'BucketNotEmpty', 'Bucket is not empty.', Bucket)
+            del self.emulator.buckets[Bucket]
+
+    def _check_region(self, method: str, Bucket: str):
+        bucket = self.emulator._bucket(method, Bucket)
+        if bucket.location != self.region:  # 真实COS中其他地区的域名解析不到该存储桶
+            raise self.emulator._error(method, 404, 'NoSuchBucket', 'The specified bucket does not exist.',
+                                       Bucket)
+        return bucket
+
+    def list_objects(self, Bucket, Prefix='', Marker='', MaxKeys=1000, **kwargs):
+        self.emulator._request('GET', Bucket)
+        max_keys = int(MaxKeys)
+        with self.emulator._lock:
+            bucket = self._check_region('GET', Bucket)
+            start = bisect_right(bucket.keys, Marker) if Marker else bisect_left(bucket.keys, Prefix)
+            start = max(start, bisect_left(bucket.keys, Prefix))
+            end = bisect_left(bucket.keys, Prefix + _MAX_CHAR, lo=start)
+            keys = bucket.keys[start:min(end, start + max_keys)]
+            contents = [{'Key': key, 'Size': str(bucket.objects[key].size), 'ETag': bucket.objects[key].etag,
+                         'LastModified': bucket.objects[key].last_modified, 'StorageClass': 'STANDARD'}
+                        for key in keys]
+            truncated = start + max_keys < end
+        response = {'Name': Bucket, 'Prefix': Prefix, 'Marker': Marker, 'MaxKeys': str(max_keys),
+                    'IsTruncated': 'true' if truncated else 'false'}
+        if contents:
+            response['Contents'] = contents
+        if truncated:
+            response['NextMarker'] = keys[-1]
+        return response
+
+    def put_object(self, Bucket, Body, Key, ContentMD5=None, Metadata=None, **kwargs):
+        data = _read_body(Body)
+        self.emulator._request('PUT', f'{Bucket}/{Key}', len(data))
+        digest = hashlib.md5(data).digest()
+        if ContentMD5 is not None and ContentMD5 != base64.b64encode(digest).decode():
+            raise self.emulator._error('PUT', 400, 'BadDigest', 'The Content-MD5 you specified did not match.',
+                                       Key)
+        etag = f'"{digest.hex()}"'
+        with self.emulator._lock:
+            bucket = self._check_region('PUT', Bucket)
+            stored = data if self.emulator.options.keep_data else None
+            bucket.put(Key, _StoredObject(len(data), etag, stored, dict(Metadata or {})))
+        return {'ETag': etag}
+
+    def _get_stored(self, method: str, Bucket, Key):
+        with self.emulator._lock:
+            bucket = self._check_region(method, Bucket)
+            obj = bucket.objects.get(Key)
+        if obj is None:
+            raise self.emulator._error(method, 404, 'NoSuchKey', 'The specified key does not exist.', Key)
+        return obj
+
+    def head_object(self, Bucket, Key, **kwargs):
+        self.emulator._request('HEAD', f'{Bucket}/{Key}')
+        obj = self._get_stored('HEAD', Bucket, Key)
+        headers = {'Content-Length': str(obj.size), 'ETag': obj.etag, 'Last-Modified': obj.last_modified}
+        headers.update(obj.metadata)
+        return headers
+
+    def object_exists(self, Bucket, Key, **kwargs):
+        try:
+            self.head_object(Bucket, Key)
+            return True
+        except CosServiceError as e:
+            if e.get_status_code() == 404:
+                return False
+            raise
+
+    def get_object(self, Bucket, Key, **kwargs):
+        self.emulator._request('GET', f'{Bucket}/{Key}')
+        obj = self._get_stored('GET', Bucket, Key)
+        data = obj.data if obj.data is not None else b'\0' * obj.size
+        self.emulator._download(len(data))
+        response = {'Content-Length': str(obj.size), 'ETag': obj.etag, 'Body': _Body(data)}
+        response.update(obj.metadata)
+        return response
+
+    def download_file(self, Bucket, Key, DestFilePath, **kwargs):
+        self.get_object(Bucket, Key)['Body'].get_stream_to_file(DestFilePath)
+
+    def delete_object(self, Bucket, Key, **kwargs):
+        self.emulator._request('DELETE', f'{Bucket}/{Key}')
+        with self.emulator._lock:
+            self._check_region('DELETE', Bucket).remove(Key)
+        return {}
+
+    def delete_objects(self, Bucket, Delete, **kwargs):
+        objects = Delete.get('Object', [])
+        self.emulator._request('POST', Bucket)
+        if len(objects) > 1000:
+            raise self.emulator._error('POST', 400, 'MalformedXML', 'Too many objects to delete.', Bucket)
+        with self.emulator._lock:
+            bucket = self._check_region('POST', Bucket)
+            for obj in objects:
+                bucket.remove(obj['Key'])
+        response = {'Error': []}
+        if str(Delete.get('Quiet', 'false')).lower() != 'true':
+            response['Deleted'] = [{'Key': obj['Key']} for obj in objects]
+        return response
+
+    def create_multipart_upload(self, Bucket, Key, Metadata=None, **kwargs):
+        self.emulator._request('POST', f'{Bucket}/{Key}')
+        upload_id = uuid.uuid4().hex
+        with self.emulator._lock:
+            self._check_region('POST', Bucket).uploads[upload_id] = (Key, dict(Metadata or {}), {})
+        return {'Bucket': Bucket, 'Key': Key, 'UploadId': upload_id}
+
+    def _get_upload(self, method: str, Bucket, Key, UploadId):
+        bucket = self._check_region(method, Bucket)
+        upload = bucket.uploads.get(UploadId)
+        if upload is None or upload[0] != Key:
+            raise self.emulator._error(method, 404, 'NoSuchUpload', 'The specified upload does not exist.', Key)
+        return bucket, upload
+
+    def upload_part(self, Bucket, Key, Body, PartNumber, UploadId, ContentMD5=None, **kwargs):
+        data = _read_body(Body)
+        self.emulator._request('PUT', f'{Bucket}/{Key}', len(data))
+        digest = hashlib.md5(data).digest()
+        if ContentMD5 is not None and ContentMD5 != base64.b64encode(digest).decode():
+            raise self.emulator._error('PUT', 400, 'BadDigest', 'The Content-MD5 you specified did not match.',
+                                       Key)
+        etag = f'"{digest.hex()}"'
+        with self.emulator._lock:
+            _, upload = self._get_upload('PUT', Bucket, Key, UploadId)
+            upload[2][int(PartNumber)] = (etag, data if self.emulator.options.keep_data else len(data))
+        return {'ETag': etag}
+
+    def list_parts(self, Bucket, Key, UploadId, PartNumberMarker=0, MaxParts=1000, **kwargs):
+        self.emulator._request('GET', f'{Bucket}/{Key}')
+        with self.emulator._lock:
+            _, upload = self._get_upload('GET', Bucket, Key, UploadId)
+            numbers = sorted(n for n in upload[2] if n > int(PartNumberMarker))
+            page = numbers[:int(MaxParts)]
+            parts = [{'PartNumber': str(n), 'ETag': upload[2][n][0]} for n in page]
+        truncated = len(numbers) > len(page)
+        response = {'Bucket': Bucket, 'Key': Key, 'UploadId': UploadId, 'Part': parts,
+                    'IsTruncated': 'true' if truncated else 'false'}
+        if truncated:
+            response['NextPartNumberMarker'] = str(page[-1])
+        return response
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload, **kwargs):
+        self.emulator._request('POST', f'{Bucket}/{Key}')
+        with self.emulator._lock:
+            bucket, (_, metadata, parts) = self._get_upload('POST', Bucket, Key, UploadId)
+            requested = MultipartUpload.get('Part', [])
+            for part in requested:
+                stored = parts.get(int(part['PartNumber']))
+                if stored is None or stored[0] != part['ETag']:
+                    raise self.emulator._error('POST', 400, 'InvalidPart',
+                                               'One or more of the specified parts could not be found.', Key)
+            chunks = [parts[int(part['PartNumber'])][1] for part in requested]
+            if self.emulator.options.keep_data:
+                data = b''.join(chunks)
+                size = len(data)
+            else:
+                data, size = None, sum(chunks)
+            md5s = b''.join(bytes.fromhex(parts[int(p['PartNumber'])][0].strip('"')) for p in requested)
+            etag = f'"{hashlib.md5(md5s).hexdigest()}-{len(requested)}"'
+            bucket.put(Key, _StoredObject(size, etag, data, metadata))
+            del bucket.uploads[UploadId]
+        return {'Bucket': Bucket, 'Key': Key, 'ETag': etag}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId, **kwargs):
+        self.emulator._request('DELETE', f'{Bucket}/{Key}')
+        with self.emulator._lock:
+            bucket, _ = self._get_upload('DELETE', Bucket, Key, UploadId)
+            del bucket.uploads[UploadId]
+        return {}
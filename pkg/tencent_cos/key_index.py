@@ -0,0 +1,34 @@
+import sys
+
+
+class RemoteKeyIndex(object):
+    """远程对象名的内存索引
+
+    对象名以驻留字符串(sys.intern)保存，哈希集合用于O(1)的成员判断，
+    有序数组用于按顺序列出文件夹和文件，两者共享同一份字符串。
+    """
+    __slots__ = ('_key_set', '_sorted_keys')
+
+    def __init__(self, keys=()):
+        self._key_set = {sys.intern(key) for key in keys}
+        self._sorted_keys = sorted(self._key_set)
+
+    def __contains__(self, key):
+        return key in self._key_set
+
+    def __len__(self):
+        return len(self._key_set)
+
+    def __iter__(self):
+        return iter(self._sorted_keys)
+
+    def __repr__(self):
+        return f'RemoteKeyIndex({len(self)} keys)'
+
+    def dirs(self):
+        """列出所有文件夹(以'/'结尾的对象)"""
+        return [key[:-1] for key in self._sorted_keys if key.endswith('/')]
+
+    def files(self):
+        """列出所有文件"""
+        return [key for key in self._sorted_keys if not key.endswith('/')]
@@ -0,0 +1,69 @@
+import hashlib
+import json
+import os
+from typing import NamedTuple
+
+from loguru import logger as log
+
+MB = 1024 * 1024
+
+
+class MultipartOptions(NamedTuple):
+    """分块上传配置，文件大小不小于threshold时走分块上传，checkpoint_dir为空时不记录断点"""
+    threshold: int = 32 * MB
+    part_size: int = 8 * MB
+    max_workers: int = 4
+    checkpoint_dir: str = None
+
+
+class MultipartCheckpoint(object):
+    """分块上传断点记录，保存UploadId和已完成分块的ETag，文件或分块大小变化后断点失效"""
+
+    def __init__(self, checkpoint_dir: str, bucket: str, object_key: str, local_path: str):
+        self.local_path = os.path.abspath(local_path)
+        name = hashlib.md5(f'{bucket}\n{object_key}\n{self.local_path}'.encode()).hexdigest()
+        self.path = os.path.join(checkpoint_dir, name + '.json') if checkpoint_dir else None
+        self.bucket = bucket
+        self.object_key = object_key
+        self.upload_id = None
+        self.parts = {}
+
+    def _signature(self, part_size: int, md5sum: str):
+        stat = os.stat(self.local_path)
+        return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                'part_size': part_size, 'md5': md5sum}
+
+    def load(self, part_size: int, md5sum: str):
+        """读取断点，文件未变化时返回True"""
+        if self.path is None or not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            if data.get('signature') != self._signature(part_size, md5sum):
+                log.warning(f'Checkpoint of {self.local_path} is outdated, restart upload')
+                self.remove()
+                return False
+            self.upload_id = data['upload_id']
+            self.parts = {int(k): v for k, v in data['parts'].items()}
+            return True
+        except Exception as e:
+            log.warning(f'Load checkpoint {self.path} failed, detail: {str(e)}')
+            return False
+
+    def save(self, part_size: int, md5sum: str):
+        """原子写入断点文件"""
+        if self.path is None:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        data = {'bucket': self.bucket, 'key': self.object_key, 'local_path': self.local_path,
+                'upload_id': self.upload_id, 'parts': self.parts,
+                'signature': self._signature(part_size, md5sum)}
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    def remove(self):
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,55 @@
+import hashlib
+import json
+import os
+import threading
+
+from loguru import logger as log
+
+
+class BucketRegionCache(object):
+    """存储桶地区与APPID的本地缓存(JSON文件)，按账号区分，避免每次连接存储桶都重新探测地区"""
+
+    def __init__(self, cache_path: str):
+        self.cache_path = cache_path
+        self._lock = threading.Lock()
+        self._data = self._load()
+
+    def _load(self):
+        if not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, 'r') as f:
+                return json.load(f)
+        except Exception as e:
+            log.warning(f'Load bucket region cache {self.cache_path} failed, detail: {str(e)}')
+            return {}
+
+    @staticmethod
+    def _key(secret_id: str, bucket_name: str):
+        # 不在缓存文件中明文记录SecretId
+        account = hashlib.md5(secret_id.encode()).hexdigest()[:16]
+        return f'{account}/{bucket_name}'
+
+    def get(self, secret_id: str, bucket_name: str):
+        """获取缓存的{'region': ..., 'appid': ...}，不存在时返回None"""
+        with self._lock:
+            return self._data.get(self._key(secret_id, bucket_name))
+
+    def set(self, secret_id: str, bucket_name: str, region: str, appid: str):
+        """记录存储桶的地区与APPID，原子写入缓存文件"""
+        with self._lock:
+            self._data[self._key(secret_id, bucket_name)] = {'region': region, 'appid': appid}
+            self._save()
+
+    def remove(self, secret_id: str, bucket_name: str):
+        """删除失效的缓存，例如存储桶被删除或迁移后"""
+        with self._lock:
+            if self._data.pop(self._key(secret_id, bucket_name), None) is not None:
+                self._save()
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        tmp_path = self.cache_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self._data, f, indent=2)
+        os.replace(tmp_path, self.cache_path)
@@ -0,0 +1,53 @@
+import threading
+
+from loguru import logger as log
+
+
+class CallbackSignal(object):
+    """不依赖Qt的简易信号，connect/disconnect/emit的用法与Qt的Signal一致
+
+    作为类属性声明，子类可以用同名的Qt Signal覆盖，从而让同一份业务代码同时用于GUI和命令行。
+    """
+
+    def __init__(self, *types):
+        self.types = types
+        self.name = None
+
+    def __set_name__(self, owner, name):
+        self.name = f'_callback_signal_{name}'
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        bound = instance.__dict__.get(self.name)
+        if bound is None:
+            bound = instance.__dict__.setdefault(self.name, BoundCallbackSignal())
+        return bound
+
+
+class BoundCallbackSignal(object):
+    """绑定到具体实例的信号，保存回调函数列表"""
+
+    def __init__(self):
+        self._slots = []
+        self._lock = threading.Lock()
+
+    def connect(self, slot):
+        with self._lock:
+            self._slots.append(slot)
+
+    def disconnect(self, slot=None):
+        with self._lock:
+            if slot is None:
+                self._slots.clear()
+            else:
+                self._slots.remove(slot)
+
+    def emit(self, *args):
+        with self._lock:
+            slots = list(self._slots)
+        for slot in slots:
+            try:
+                slot(*args)
+            except Exception as e:
+                log.error(f'Callback {slot} failed, detail: {str(e)}')
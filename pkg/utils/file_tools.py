@@ -1,3 +1,4 @@
+import codecs
 import hashlib
 import os.path
 import pathlib
@@ -12,7 +13,7 @@ def get_file_md5sum(file_path: str):
         raise FileNotFoundError(f'cannot found file: {file_path}')
     with open(file_path, 'rb') as f:
         md5hash = hashlib.md5()
-        for buffer in iter(partial(f.read, 128), b''):
+        for buffer in iter(partial(f.read, 1024 * 1024), b''):
             md5hash.update(buffer)
         return md5hash.hexdigest()
 
@@ -43,14 +44,52 @@ def is_image_file(file: str, ignore_hidden_file: bool = True):
         return False
 
 
+_ENCODING_CACHE = {}
+_ENCODING_CACHE_SIZE = 65536
+_BOMS = [
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+_CHARDET_PREFIX_SIZE = 64 * 1024
+
+
 def get_encoding(file: str):
-    detector = chardet.UniversalDetector()
-    detector.reset()
-    for line in open(file, 'rb'):
-        detector.feed(line)
-        if detector.done:
-            break
-    detector.close()
-    log.info(f'file: {file}, {detector.result}')
-
-    return detector.result.get('encoding')
+    """检测文本文件编码：优先按BOM和严格UTF-8快速判断，失败时才用chardet检测文件开头部分，
+    结果按(路径, 大小, mtime_ns)缓存"""
+    stat = os.stat(file)
+    cache_key = (os.path.abspath(file), stat.st_size, stat.st_mtime_ns)
+    encoding = _ENCODING_CACHE.get(cache_key)
+    if encoding is None:
+        encoding = _detect_encoding(file)
+        if len(_ENCODING_CACHE) >= _ENCODING_CACHE_SIZE:
+            _ENCODING_CACHE.clear()
+        _ENCODING_CACHE[cache_key] = encoding
+    return encoding
+
+
+def _detect_encoding(file: str):
+    with open(file, 'rb') as f:
+        head = f.read(4)
+        for bom, encoding in _BOMS:
+            if head.startswith(bom):
+                return encoding
+
+        # 严格UTF-8增量解码整个文件，纯ASCII文件同样视为UTF-8
+        f.seek(0)
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='strict')
+        try:
+            for buffer in iter(partial(f.read, 1024 * 1024), b''):
+                decoder.decode(buffer)
+            decoder.decode(b'', final=True)
+            return 'utf-8'
+        except UnicodeDecodeError:
+            pass
+
+        f.seek(0)
+        prefix = f.read(_CHARDET_PREFIX_SIZE)
+    result = chardet.detect(prefix)
+    log.info(f'file: {file}, {result}')
+    return result.get('encoding')
@@ -0,0 +1,59 @@
+import os
+import sqlite3
+import threading
+
+from loguru import logger as log
+
+from pkg.utils.file_tools import get_file_md5sum
+
+
+class FileHashCache(object):
+    """本地文件md5哈希值的持久化缓存，以(路径, 大小, mtime_ns, inode)为键，文件未变化时不再重复计算"""
+
+    def __init__(self, db_path: str):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS file_hashes ('
+                'path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, inode INTEGER, md5 TEXT)')
+
+    def _lookup(self, path: str):
+        """返回(缓存键, 缓存的md5)，文件变化后md5为None"""
+        stat = os.stat(path)
+        key = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT size, mtime_ns, inode, md5 FROM file_hashes WHERE path = ?',
+                (path,)).fetchone()
+        return key, row[3] if row is not None and tuple(row[:3]) == key else None
+
+    def get_cached_md5sum(self, file_path: str):
+        """只读取缓存，不存在或文件已变化时返回None，不计算哈希"""
+        if not os.path.isfile(file_path):
+            return None
+        return self._lookup(os.path.abspath(file_path))[1]
+
+    def get_md5sum(self, file_path: str):
+        """获取文件的md5哈希值，优先读取缓存"""
+        if not os.path.isfile(file_path):
+            raise FileNotFoundError(f'cannot found file: {file_path}')
+        path = os.path.abspath(file_path)
+        key, md5hash = self._lookup(path)
+        if md5hash is not None:
+            return md5hash
+
+        md5hash = get_file_md5sum(path)
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO file_hashes (path, size, mtime_ns, inode, md5) '
+                'VALUES (?, ?, ?, ?, ?)', (path, *key, md5hash))
+        log.debug(f'file: {path}, md5: {md5hash} (cached)')
+        return md5hash
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
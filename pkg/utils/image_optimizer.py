@@ -0,0 +1,338 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+from loguru import logger as log
+
+from pkg.utils.file_tools import get_file_md5sum
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # 未安装Pillow时不进行图片优化
+    Image = None
+    ImageOps = None
+
+# 可以被Pillow重新编码的图片后缀，gif(可能是动图)和svg保持原样
+OPTIMIZABLE_SUFFIXES = {'png': 'PNG', 'jpg': 'JPEG', 'jpeg': 'JPEG', 'bmp': 'BMP', 'tif': 'TIFF',
+                        'tiff': 'TIFF', 'webp': 'WEBP'}
+# 未指定转换格式时，未压缩的格式转为无损PNG
+LOSSLESS_TRANSCODE = {'bmp': 'png', 'tif': 'png', 'tiff': 'png'}
+FORMAT_SUFFIXES = {'png': 'PNG', 'jpg': 'JPEG', 'webp': 'WEBP', 'avif': 'AVIF'}
+# 有损格式保持原格式时，默认不重新编码像素
+LOSSY_FORMATS = {'JPEG', 'WEBP'}
+# 去除元数据时丢弃的JPEG段：APP1(EXIF/XMP)、APP13(IPTC)、COM(注释)，ICC、Adobe等解码需要的段保留
+JPEG_METADATA_MARKERS = {0xE1, 0xED, 0xFE}
+EXIF_ORIENTATION = 0x0112
+
+
+class OptimizeOptions(NamedTuple):
+    """图片优化配置，convert_format为空时保持原格式(BMP/TIF转为PNG)，max_dimension为0时不缩放
+
+    lossy_recompress为False时，保持原格式且无需缩放的JPEG/WebP不重新编码，JPEG只无损去除元数据。
+    """
+    max_dimension: int = 0
+    strip_exif: bool = True
+    convert_format: str = ''
+    quality: int = 85
+    lossy_recompress: bool = False
+
+    def signature(self):
+        """配置的短哈希，作为缓存文件名的一部分，配置变化后重新生成"""
+        return hashlib.md5(repr(tuple(self)).encode()).hexdigest()[:8]
+
+
+class OptimizedImage(NamedTuple):
+    """优化结果，path为实际上传的文件，name为远程对象名"""
+    path: str
+    name: str
+    optimized: bool
+
+
+class ImageVariant(NamedTuple):
+    """指定宽度的图片，name为远程对象名(如 image@480w.png)"""
+    width: int
+    path: str
+    name: str
+
+
+def variant_name(object_name: str, width: int):
+    """不同宽度图片的远程对象名，由原对象名和宽度唯一确定"""
+    stem, suffix = object_name.rsplit('.', 1)
+    return f'{stem}@{width}w.{suffix}'
+
+
+def target_suffix(file_name: str, options: OptimizeOptions):
+    """优化后的文件后缀，不支持优化的图片返回None"""
+    suffix = file_name.split('.')[-1].lower()
+    if suffix not in OPTIMIZABLE_SUFFIXES:
+        return None
+    if options.convert_format:
+        return options.convert_format.lower()
+    return LOSSLESS_TRANSCODE.get(suffix, suffix)
+
+
+def _target_format(dst_path: str):
+    dst_suffix = dst_path.split('.')[-1].lower()
+    return FORMAT_SUFFIXES.get(dst_suffix, OPTIMIZABLE_SUFFIXES.get(dst_suffix))
+
+
+def _open_image(src_path: str, options: OptimizeOptions):
+    """打开图片并按配置处理方向和最大尺寸，返回(图片, 原EXIF)"""
+    img = Image.open(src_path)
+    exif = img.info.get('exif')
+    if options.strip_exif:
+        img = ImageOps.exif_transpose(img)  # 丢弃EXIF前先按拍摄方向旋转
+    if options.max_dimension and max(img.size) > options.max_dimension:
+        img.thumbnail((options.max_dimension, options.max_dimension), Image.LANCZOS)
+    return img, exif
+
+
+def _save_image(img, dst_path: str, options: OptimizeOptions, exif: bytes = None):
+    """按目标格式压缩保存，先写临时文件再替换"""
+    dst_format = _target_format(dst_path)
+    save_kwargs = {}
+    if dst_format == 'PNG':
+        save_kwargs['optimize'] = True
+    elif dst_format == 'JPEG':
+        save_kwargs.update(quality=options.quality, optimize=True, progressive=True)
+        if img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+    elif dst_format in ('WEBP', 'AVIF'):
+        save_kwargs['quality'] = options.quality
+        if dst_format == 'WEBP':
+            save_kwargs['method'] = 6
+    if exif and not options.strip_exif:
+        save_kwargs['exif'] = exif
+    tmp_path = dst_path + '.tmp'
+    img.save(tmp_path, format=dst_format, **save_kwargs)
+    return tmp_path
+
+
+def _strip_jpeg_metadata(src_path: str, dst_path: str, orientation: int):
+    """不解码像素，复制JPEG时丢弃元数据段，拍摄方向写入只含方向的EXIF段，返回临时文件路径"""
+    with open(src_path, 'rb') as f:
+        data = f.read()
+    if data[:2] != b'\xff\xd8':
+        raise ValueError('Not a JPEG file')
+    segments = []
+    pos = 2
+    while pos + 4 <= len(data):
+        if data[pos] != 0xFF:
+            raise ValueError(f'Invalid JPEG marker at {pos}')
+        marker = data[pos + 1]
+        if marker == 0xFF:  # 段之间的填充字节
+            pos += 1
+            continue
+        if marker == 0xDA:  # SOS之后是压缩数据，原样复制
+            break
+        end = pos + 2 + int.from_bytes(data[pos + 2:pos + 4], 'big')
+        if marker not in JPEG_METADATA_MARKERS:
+            segments.append(data[pos:end])
+        pos = end
+    if orientation != 1:
+        exif = Image.Exif()
+        exif[EXIF_ORIENTATION] = orientation
+        payload = exif.tobytes()
+        # EXIF段紧跟在JFIF的APP0段之后
+        index = 1 if segments and segments[0][1] == 0xE0 else 0
+        segments.insert(index, b'\xff\xe1' + (len(payload) + 2).to_bytes(2, 'big') + payload)
+    tmp_path = dst_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data[:2] + b''.join(segments) + data[pos:])
+    return tmp_path
+
+
+def _keep_lossy_pixels(src_path: str, dst_path: str, options: OptimizeOptions):
+    """有损格式保持原格式且无需缩放时不重新编码，返回JPEG去除元数据后的临时文件路径，无需处理时返回''
+
+    需要走常规的解码/编码流程时返回None。
+    """
+    src_suffix, dst_suffix = src_path.split('.')[-1].lower(), dst_path.split('.')[-1].lower()
+    if options.lossy_recompress or src_suffix != dst_suffix or \
+            OPTIMIZABLE_SUFFIXES.get(src_suffix) not in LOSSY_FORMATS:
+        return None
+    with Image.open(src_path) as img:
+        if options.max_dimension and max(img.size) > options.max_dimension:
+            return None
+        orientation = img.getexif().get(EXIF_ORIENTATION, 1)
+        img_format = img.format
+    if img_format != 'JPEG' or not options.strip_exif:
+        return ''
+    return _strip_jpeg_metadata(src_path, dst_path, orientation)
+
+
+def optimize_image(src_path: str, dst_path: str, options: OptimizeOptions):
+    """压缩/转码单张图片(在子进程中运行)，格式未变且结果不比原图小时不写入dst并返回False"""
+    tmp_path = _keep_lossy_pixels(src_path, dst_path, options)
+    if tmp_path == '':
+        return False
+    if tmp_path is None:
+        img, exif = _open_image(src_path, options)
+        with img:
+            tmp_path = _save_image(img, dst_path, options, exif)
+    if src_path.split('.')[-1].lower() == dst_path.split('.')[-1].lower() and \
+            os.path.getsize(tmp_path) >= os.path.getsize(src_path):
+        os.remove(tmp_path)
+        return False
+    os.replace(tmp_path, dst_path)
+    return True
+
+
+def make_variants(src_path: str, dst_paths: dict, options: OptimizeOptions):
+    """生成不同宽度的图片(在子进程中运行)，dst_paths为{宽度: 文件路径}，不放大图片
+
+    返回(图片经过最大尺寸限制后的宽度, {宽度: 文件路径})
+    """
+    img, exif = _open_image(src_path, options)
+    with img:
+        full_width = img.width
+        variants = {}
+        for width, dst_path in sorted(dst_paths.items()):
+            if width >= full_width:
+                continue
+            variant = img.resize((width, max(1, round(img.height * width / full_width))), Image.LANCZOS)
+            os.replace(_save_image(variant, dst_path, options, exif), dst_path)
+            variants[width] = dst_path
+    return full_width, variants
+
+
+def _safe_make_variants(src_path: str, dst_paths: dict, options: OptimizeOptions):
+    try:
+        return make_variants(src_path, dst_paths, options), ''
+    except Exception as e:
+        return (None, {}), str(e)
+
+
+def _safe_optimize_image(src_path: str, dst_path: str, options: OptimizeOptions):
+    try:
+        return optimize_image(src_path, dst_path, options), ''
+    except Exception as e:
+        return False, str(e)
+
+
+class ImageOptimizer(object):
+    """上传前的图片优化：在进程池中并行压缩、缩放、去除EXIF或转码为WebP/AVIF
+
+    优化结果以(源文件md5, 配置)缓存在cache_dir中，同一张图片只处理一次；
+    优化无收益或失败的图片记录一个.skip标记，之后直接上传原图。
+    """
+
+    def __init__(self, cache_dir: str, options: OptimizeOptions = OptimizeOptions(), max_workers: int = None,
+                 md5_func=None):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cache_dir = cache_dir
+        self.options = options
+        self.max_workers = max_workers
+        self.md5_func = get_file_md5sum if md5_func is None else md5_func
+
+    @staticmethod
+    def available():
+        """是否安装了Pillow"""
+        return Image is not None
+
+    def object_name(self, local_file: str):
+        """优化后的远程对象名，转码时替换后缀，无需实际运行优化"""
+        file_name = local_file.split('/')[-1]
+        suffix = target_suffix(file_name, self.options)
+        if suffix is None or suffix == file_name.split('.')[-1].lower():
+            return file_name
+        return file_name.rsplit('.', 1)[0] + '.' + suffix
+
+    def _cache_path(self, local_file: str, suffix: str):
+        return os.path.join(self.cache_dir,
+                            f'{self.md5_func(local_file)}-{self.options.signature()}.{suffix}')
+
+    def _run_jobs(self, func, sources: list, targets: list):
+        """执行一批图片处理任务，多于一个任务时使用进程池"""
+        if len(sources) == 1:
+            return [func(sources[0], targets[0], self.options)]
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(func, sources, targets, [self.options] * len(sources)))
+
+    def optimize_files(self, local_files: list):
+        """优化一组图片，返回 {本地文件: OptimizedImage}，不需要或无法优化的图片返回原文件"""
+        results = {}
+        jobs = {}  # {本地文件: 缓存文件}
+        for local_file in local_files:
+            file_name = local_file.split('/')[-1]
+            suffix = target_suffix(file_name, self.options)
+            if suffix is None:
+                results[local_file] = OptimizedImage(local_file, file_name, False)
+                continue
+            cache_path = self._cache_path(local_file, suffix)
+            if os.path.exists(cache_path):
+                results[local_file] = OptimizedImage(cache_path, self.object_name(local_file), True)
+            elif os.path.exists(cache_path + '.skip'):
+                results[local_file] = OptimizedImage(local_file, file_name, False)
+            else:
+                jobs[local_file] = cache_path
+
+        if jobs:
+            sources, targets = list(jobs), list(jobs.values())
+            outcomes = self._run_jobs(_safe_optimize_image, sources, targets)
+            for local_file, cache_path, (ok, err) in zip(sources, targets, outcomes):
+                if ok:
+                    results[local_file] = OptimizedImage(cache_path, self.object_name(local_file), True)
+                else:
+                    if err:
+                        log.warning(f'Optimize {local_file} failed, upload original, detail: {err}')
+                    open(cache_path + '.skip', 'w').close()
+                    results[local_file] = OptimizedImage(local_file, local_file.split('/')[-1], False)
+        log.info(f'Optimize {len(local_files)} images, {len(jobs)} processed, '
+                 f'{len(local_files) - len(jobs)} from cache')
+        return results
+
+    def make_variants(self, local_files: list, widths: list):
+        """为一组图片生成不同宽度的版本，返回 {本地文件: (宽度, [ImageVariant])}
+
+        结果按(源文件md5, 配置, 宽度列表)记录在清单文件中，不支持的图片不返回。
+        """
+        widths = sorted(set(w for w in widths if w > 0))
+        if not widths:
+            return {}
+        widths_sig = '-'.join(str(w) for w in widths)
+        results = {}
+        jobs = {}  # {本地文件: (清单文件, {宽度: 文件路径})}
+        for local_file in local_files:
+            suffix = target_suffix(local_file.split('/')[-1], self.options)
+            if suffix is None:
+                continue
+            prefix = os.path.join(self.cache_dir, f'{self.md5_func(local_file)}-{self.options.signature()}')
+            manifest_path = f'{prefix}-w{widths_sig}.json'
+            manifest = self._load_manifest(manifest_path)
+            if manifest is not None:
+                results[local_file] = self._variants_of(local_file, *manifest)
+            else:
+                jobs[local_file] = (manifest_path, {w: f'{prefix}@{w}w.{suffix}' for w in widths})
+
+        if jobs:
+            sources = list(jobs)
+            outcomes = self._run_jobs(_safe_make_variants, sources, [jobs[f][1] for f in sources])
+            for local_file, ((full_width, variants), err) in zip(sources, outcomes):
+                if err:
+                    log.warning(f'Make variants of {local_file} failed, detail: {err}')
+                with open(jobs[local_file][0], 'w') as f:
+                    json.dump({'width': full_width, 'variants': variants}, f)
+                results[local_file] = self._variants_of(local_file, full_width, variants)
+        log.info(f'Make {widths_sig} variants of {len(local_files)} images, {len(jobs)} processed')
+        return results
+
+    @staticmethod
+    def _load_manifest(manifest_path: str):
+        if not os.path.exists(manifest_path):
+            return None
+        try:
+            with open(manifest_path, 'r') as f:
+                manifest = json.load(f)
+            variants = {int(w): path for w, path in manifest['variants'].items()}
+            if all(os.path.exists(path) for path in variants.values()):
+                return manifest['width'], variants
+        except Exception as e:
+            log.warning(f'Load variants manifest {manifest_path} failed, detail: {str(e)}')
+        return None
+
+    def _variants_of(self, local_file: str, full_width: int, variants: dict):
+        name = self.object_name(local_file)
+        return full_width, [ImageVariant(w, path, variant_name(name, w)) for w, path in sorted(variants.items())]
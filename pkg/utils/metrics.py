@@ -0,0 +1,187 @@
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+MB = 1024 * 1024
+
+# 阶段名称与控制台摘要中显示的名称
+PHASE_LABELS = {
+    'scan': '扫描笔记',
+    'list': '列举',
+    'index': '索引',
+    'hash': '哈希',
+    'probe': 'HEAD',
+    'optimize': '优化',
+    'variants': '多尺寸',
+    'put': '上传',
+    'rewrite': '改写笔记',
+    'signal': '信号',
+}
+
+
+def percentile(values: list, q: float):
+    """最近秩法计算百分位数"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class PhaseStats(object):
+    """单个阶段的累计统计，durations记录每次操作(或每批操作)的耗时"""
+    __slots__ = ('count', 'bytes', 'errors', 'durations', 'first_start', 'last_end')
+
+    def __init__(self):
+        self.count = 0
+        self.bytes = 0
+        self.errors = 0
+        self.durations = []
+        self.first_start = None
+        self.last_end = None
+
+    def to_dict(self):
+        total = sum(self.durations)
+        # 并发操作的耗时会重叠，吞吐量按该阶段从开始到结束的时间计算
+        wall = self.last_end - self.first_start if self.durations else 0.0
+        p50, p95 = percentile(self.durations, 50), percentile(self.durations, 95)
+        return {
+            'count': self.count,
+            'samples': len(self.durations),
+            'bytes': self.bytes,
+            'errors': self.errors,
+            'total_s': total,
+            'wall_s': wall,
+            'p50_ms': None if p50 is None else p50 * 1000,
+            'p95_ms': None if p95 is None else p95 * 1000,
+            'bytes_per_s': self.bytes / wall if self.bytes and wall > 0 else None,
+        }
+
+
+class RunMetrics(object):
+    """一次检查/同步/转换的分阶段统计：各阶段的次数、字节数、p50/p95耗时和吞吐量，可被多个线程同时记录"""
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.started_at = time.time()
+        self.duration = None
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self._phases = {}
+
+    def record(self, phase: str, seconds: float, num_bytes: int = 0, count: int = 1, error: bool = False):
+        """记录一次刚结束的操作，count大于1时表示一批操作"""
+        end = time.perf_counter()
+        with self._lock:
+            stats = self._phases.get(phase)
+            if stats is None:
+                stats = self._phases[phase] = PhaseStats()
+            stats.count += count
+            stats.bytes += num_bytes
+            stats.errors += 1 if error else 0
+            stats.durations.append(seconds)
+            start = end - seconds
+            stats.first_start = start if stats.first_start is None else min(stats.first_start, start)
+            stats.last_end = end if stats.last_end is None else max(stats.last_end, end)
+
+    @contextmanager
+    def phase(self, phase: str, num_bytes: int = 0, count: int = 1):
+        """统计with块的耗时，抛出异常时记为一次失败"""
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.record(phase, time.perf_counter() - start, num_bytes, count, error=True)
+            raise
+        self.record(phase, time.perf_counter() - start, num_bytes, count)
+
+    def finish(self):
+        self.duration = time.perf_counter() - self._start
+
+    def to_dict(self):
+        """JSON运行报告"""
+        duration = time.perf_counter() - self._start if self.duration is None else self.duration
+        with self._lock:
+            phases = {name: stats.to_dict() for name, stats in self._phases.items()}
+        return {
+            'kind': self.kind,
+            'started_at': time.strftime('%Y-%m-%dT%H:%M:%S%z', time.localtime(self.started_at)),
+            'timestamp': self.started_at,
+            'duration_s': duration,
+            'phases': phases,
+            'summary': format_summary(self.kind, duration, phases),
+        }
+
+
+def format_summary(kind: str, duration: float, phases: dict):
+    """一行文字摘要，如: [统计] upload 用时3.21s | 上传 12次 累计2.90s 5.3MB p50 80.0ms p95 210.0ms 4.1MB/s"""
+    parts = [f'[统计] {kind} 用时{duration:.2f}s']
+    for name, stats in phases.items():
+        # 累计耗时为各次操作耗时之和，并发阶段可能超过总用时
+        text = f'{PHASE_LABELS.get(name, name)} {stats["count"]}次 累计{stats["total_s"]:.2f}s'
+        if stats['bytes']:
+            text += f' {stats["bytes"] / MB:.1f}MB'
+        if stats['samples'] > 1:  # 整批记录的阶段(如改写笔记)没有单次操作的耗时分布
+            text += f' p50 {stats["p50_ms"]:.1f}ms p95 {stats["p95_ms"]:.1f}ms'
+        if stats['bytes_per_s']:
+            text += f' {stats["bytes_per_s"] / MB:.1f}MB/s'
+        if stats['errors']:
+            text += f' 失败{stats["errors"]}次'
+        parts.append(text)
+    return ' | '.join(parts)
+
+
+def append_json_report(report: dict, report_path: str):
+    """追加一行JSON运行报告"""
+    os.makedirs(os.path.dirname(report_path), exist_ok=True)
+    with open(report_path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(report, ensure_ascii=False) + '\n')
+
+
+def _escape_label(value: str):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_prometheus(reports: list, prefix: str = 'obsidian_img_uploader'):
+    """将各类运行的最近一次报告转换为Prometheus文本格式"""
+    run_metrics = [('run_duration_seconds', 'Duration of the last run', lambda r: r['duration_s']),
+                   ('run_timestamp_seconds', 'Start time of the last run', lambda r: r['timestamp'])]
+    phase_metrics = [('phase_operations', 'Operations in the phase', 'count'),
+                     ('phase_errors', 'Failed operations in the phase', 'errors'),
+                     ('phase_bytes', 'Bytes processed in the phase', 'bytes'),
+                     ('phase_seconds', 'Summed operation time of the phase', 'total_s'),
+                     ('phase_wall_seconds', 'Wall time from the first to the last operation', 'wall_s'),
+                     ('phase_bytes_per_second', 'Throughput of the phase', 'bytes_per_s')]
+    lines = []
+    for name, help_text, getter in run_metrics:
+        lines += [f'# HELP {prefix}_{name} {help_text}', f'# TYPE {prefix}_{name} gauge']
+        lines += [f'{prefix}_{name}{{kind="{_escape_label(r["kind"])}"}} {getter(r)}' for r in reports]
+    for name, help_text, key in phase_metrics:
+        lines += [f'# HELP {prefix}_{name} {help_text}', f'# TYPE {prefix}_{name} gauge']
+        for report in reports:
+            for phase, stats in report['phases'].items():
+                if stats[key] is not None:
+                    labels = f'kind="{_escape_label(report["kind"])}",phase="{_escape_label(phase)}"'
+                    lines.append(f'{prefix}_{name}{{{labels}}} {stats[key]}')
+    name = 'phase_latency_seconds'
+    lines += [f'# HELP {prefix}_{name} Operation latency quantiles of the phase', f'# TYPE {prefix}_{name} gauge']
+    for report in reports:
+        for phase, stats in report['phases'].items():
+            for quantile, key in [('0.5', 'p50_ms'), ('0.95', 'p95_ms')]:
+                if stats[key] is not None:
+                    labels = f'kind="{_escape_label(report["kind"])}",phase="{_escape_label(phase)}",' \
+                             f'quantile="{quantile}"'
+                    lines.append(f'{prefix}_{name}{{{labels}}} {stats[key] / 1000}')
+    return '\n'.join(lines) + '\n'
+
+
+def write_prometheus_textfile(reports: list, textfile_path: str):
+    """原子写入node_exporter textfile collector可读取的.prom文件"""
+    os.makedirs(os.path.dirname(os.path.abspath(textfile_path)), exist_ok=True)
+    tmp_path = textfile_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(format_prometheus(reports))
+    os.replace(tmp_path, textfile_path)
@@ -1,5 +1,5 @@
 import os
-import shutil
+import threading
 
 import yaml
 from loguru import logger as log
@@ -8,11 +8,75 @@ from src.config_model import DEFAULT_CONFIG, AppConfigModel
 from src.env import DEFAULT_CONFIG_PATH
 
 
+class ConfigService(object):
+    """配置缓存服务，每个配置文件共享一个实例
+
+    只在配置文件的修改时间或大小变化时才重新解析YAML并校验。
+    get_config返回的是共享的缓存对象，不要直接修改，需要修改时使用ConfigLoader.read_config的副本。
+    """
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, config_file: str):
+        self.config_file = config_file
+        self._lock = threading.Lock()
+        self._config = None
+        self._signature = None
+
+    @classmethod
+    def instance(cls, config_file: str):
+        """获取配置文件对应的共享实例"""
+        config_file = os.path.abspath(config_file)
+        with cls._instances_lock:
+            if config_file not in cls._instances:
+                cls._instances[config_file] = cls(config_file)
+            return cls._instances[config_file]
+
+    def _stat_signature(self):
+        stat = os.stat(self.config_file)
+        return stat.st_mtime_ns, stat.st_size
+
+    def get_config(self):
+        """获取最新配置，文件未变化时直接返回缓存"""
+        signature = self._stat_signature()
+        with self._lock:
+            if signature == self._signature:
+                return self._config
+            log.debug(f'Read user config in {self.config_file}...')
+            with open(self.config_file, 'r') as f:
+                config = AppConfigModel(**yaml.safe_load(f))
+            self._config, self._signature = config, signature
+        return config
+
+    def is_valid(self):
+        """检查配置文件是否合法，合法的配置同时被缓存"""
+        try:
+            self.get_config()
+            return True
+        except Exception as e:
+            log.warning(f'check user config in {self.config_file} format error, detail: {str(e)}')
+            return False
+
+    def save_config(self, new_config: AppConfigModel):
+        """写入配置文件并更新缓存"""
+        with self._lock:
+            with open(self.config_file, 'w') as f:
+                yaml.safe_dump(new_config.dict(), f)
+            self._config = new_config.copy(deep=True)
+            self._signature = self._stat_signature()
+
+    def invalidate(self):
+        """丢弃缓存，下次读取时重新解析配置文件"""
+        with self._lock:
+            self._signature = None
+
+
 class ConfigLoader(object):
     """加载配置"""
 
     def __init__(self, config_file=None):
         self.config_file = self._get_config_file(config_file)
+        self.service = ConfigService.instance(self.config_file)
         self.config = {}
 
     def _get_config_file(self, config_file):
@@ -22,30 +86,27 @@ class ConfigLoader(object):
         return self.init_user_config()
 
     def read_config(self):
-        """读取配置"""
-        log.debug(f'Read user config in {self.config_file}...')
-        with open(self.config_file, 'r') as f:
-            self.config = AppConfigModel(**yaml.safe_load(f))
-
+        """读取配置，返回可修改的副本，配置文件未变化时不重新解析"""
+        self.config = self.service.get_config().copy(deep=True)
         return self.config
 
     def update_config(self, new_config: AppConfigModel = None):
         """更新当前配置"""
         new_config = self.config if new_config is None else new_config
-        with open(self.config_file, 'w') as f:
-            yaml.safe_dump(new_config.dict(), f)
+        self.service.save_config(new_config)
 
     def init_user_config(self):
         """初始化用户配置"""
         user_config = os.path.join(DEFAULT_CONFIG_PATH, 'app_config.yaml')
-        if os.path.exists(user_config) and self.check_user_config(user_config):
+        if os.path.exists(user_config) and ConfigService.instance(user_config).is_valid():
             log.debug(f'check user config in {user_config} format success')
         else:
             log.warning(f'check user config in {user_config} format failed')
-            shutil.rmtree(DEFAULT_CONFIG_PATH, ignore_errors=True)
+            # 只替换配置文件，同目录下的索引、缓存、分块上传断点和上传记录等用户数据保留
             os.makedirs(DEFAULT_CONFIG_PATH, exist_ok=True)
             with open(user_config, 'w') as f:
                 yaml.safe_dump(DEFAULT_CONFIG, f)
+            ConfigService.instance(user_config).invalidate()
             log.info(f'init user config in {user_config} format success')
 
         return user_config
@@ -1,3 +1,5 @@
+from typing import List
+
 from pydantic import BaseModel
 
 DEFAULT_CONFIG = {
@@ -14,7 +16,34 @@ DEFAULT_CONFIG = {
         'note_default_path': '/',
         'overwrite_suffix': '_new',
         'recent_note_path': '/',
-        'vault_path': '/'
+        'vault_path': '/',
+        'convert_workers': 4
+    },
+    'uploader': {
+        'max_workers': 8,
+        'remote_index_ttl': 3600,
+        'verify_with_etag': True,
+        'multipart_threshold_mb': 32,
+        'multipart_part_size_mb': 8,
+        'multipart_workers': 4,
+        'watch_debounce': 2.0,
+        'watch_poll_interval': 2.0,
+        'pool_connections': 10,
+        'pool_maxsize': 32,
+        'keep_alive': True,
+        'metrics_report': True,
+        'metrics_textfile': ''
+    },
+    'optimize': {
+        'enabled': False,
+        'workers': 4,
+        'max_dimension': 0,
+        'strip_exif': True,
+        'convert_format': '',
+        'quality': 85,
+        'lossy_recompress': False,
+        'variant_widths': [],
+        'srcset': False
     }
 }
 
@@ -36,8 +65,39 @@ class ObsidianConfigModel(BaseModel):
     overwrite_suffix: str
     recent_note_path: str
     vault_path: str
+    convert_workers: int = 4
+
+
+class UploaderConfigModel(BaseModel):
+    max_workers: int = 8
+    remote_index_ttl: int = 3600
+    verify_with_etag: bool = True
+    multipart_threshold_mb: int = 32
+    multipart_part_size_mb: int = 8
+    multipart_workers: int = 4
+    watch_debounce: float = 2.0
+    watch_poll_interval: float = 2.0
+    pool_connections: int = 10
+    pool_maxsize: int = 32
+    keep_alive: bool = True
+    metrics_report: bool = True  # 每次运行后追加JSON报告到METRICS_REPORT_PATH
+    metrics_textfile: str = ''  # 不为空时写入Prometheus textfile
+
+
+class OptimizeConfigModel(BaseModel):
+    enabled: bool = False
+    workers: int = 4
+    max_dimension: int = 0
+    strip_exif: bool = True
+    convert_format: str = ''  # 为空时保持原格式，可选webp、avif、jpg、png
+    quality: int = 85  # 用于转码、缩放和lossy_recompress
+    lossy_recompress: bool = False  # 允许以quality重新编码原格式的JPEG/WebP，默认只无损去除JPEG元数据
+    variant_widths: List[int] = []  # 额外生成的图片宽度，如[480, 960]
+    srcset: bool = False  # 转换笔记时输出带srcset的<img>标签
 
 
 class AppConfigModel(BaseModel):
     cos: CosConfigModel
     obsidian: ObsidianConfigModel
+    uploader: UploaderConfigModel = UploaderConfigModel()
+    optimize: OptimizeConfigModel = OptimizeConfigModel()
@@ -0,0 +1,96 @@
+from loguru import logger as log
+
+from pkg.tencent_cos.region_cache import BucketRegionCache
+from src.config_loader import ConfigLoader
+from src.env import BUCKET_REGION_CACHE_PATH
+
+
+class CosServer(object):
+    """COS连接管理，不依赖Qt，腾讯云SDK在第一次连接时才导入"""
+
+    def __init__(self):
+        self.config_service = ConfigLoader().service
+        self.config = self.config_service.get_config()
+        self.cos_client = None
+        self.cos_bucket = None
+        self.region_cache = BucketRegionCache(BUCKET_REGION_CACHE_PATH)
+
+    def _reload_config(self):
+        self.config = self.config_service.get_config()
+
+    def _is_server_config_changed(self):
+        latest_config = self.config_service.get_config()
+        if latest_config.cos.tencent.secret_id != self.config.cos.tencent.secret_id:
+            log.warning('User config cos.tencent.secret_id changed')
+            return True
+        elif latest_config.cos.tencent.secret_key != self.config.cos.tencent.secret_key:
+            log.warning('User config cos.tencent.secret_key changed')
+            return True
+        else:
+            return False
+
+    def reconnect_server(self):
+        """连接到腾讯COS，获取存储桶信息"""
+        from pkg.tencent_cos.client_pool import CLIENT_POOL, ClientPoolOptions
+        from pkg.tencent_cos.cos import TencentCos
+
+        uploader_config = self.config_service.get_config().uploader
+        pool_changed = CLIENT_POOL.configure(ClientPoolOptions(
+            pool_connections=uploader_config.pool_connections, pool_maxsize=uploader_config.pool_maxsize,
+            keep_alive=uploader_config.keep_alive))
+        if pool_changed or self._is_server_config_changed() or \
+                (not isinstance(self.cos_client, TencentCos)):
+            self._reload_config()
+            self.cos_client = None
+            self.cos_bucket = None
+            try:
+                self.cos_client = self._create_client()
+                log.info('reconnect server success')
+                return True
+            except Exception as e:
+                log.error(f'reconnect server error, detail: {str(e)}')
+                return False
+        else:
+            log.info('reconnect server skipped')
+            return True
+
+    def _create_client(self):
+        """创建COS客户端，配置的存储桶已有地区缓存时直接使用缓存的地区和APPID，不请求存储桶列表"""
+        from pkg.tencent_cos.cos import TencentCos
+
+        tencent_config = self.config.cos.tencent
+        cached = self.region_cache.get(tencent_config.secret_id, tencent_config.bucket)
+        if cached is not None:
+            return TencentCos(tencent_config.secret_id, tencent_config.secret_key,
+                              cached['region'], appid=cached['appid'])
+        return TencentCos(tencent_config.secret_id, tencent_config.secret_key)
+
+    def connect_bucket(self, bucket_name: str):
+        """连接到COS存储桶"""
+        if not self.reconnect_server():
+            return False
+        elif self.cos_bucket is not None:
+            return self._validate_bucket(bucket_name)
+        else:
+            return self._reconnect_bucket(bucket_name)
+
+    def _validate_bucket(self, bucket_name: str):
+        if bucket_name == self.cos_bucket.name:
+            log.info(f'Already connected to {bucket_name}.')
+            return True
+        elif bucket_name not in self.cos_client.list_buckets():
+            log.error(f'Cannot find bucket: {bucket_name}')
+            return False
+        else:
+            return self._reconnect_bucket(bucket_name)
+
+    def _reconnect_bucket(self, bucket_name: str):
+        from pkg.tencent_cos.cos_bucket import TencentCosBucket
+
+        try:
+            self.cos_bucket = TencentCosBucket(self.cos_client, bucket_name, self.region_cache)
+            log.info(f'Connect to cos bucket {bucket_name} success!')
+            return True
+        except Exception as e:
+            log.error(str(e))
+            return False
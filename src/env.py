@@ -6,6 +6,14 @@ from loguru import logger as log
 APP_NAME = 'ObsidianImageUploader'
 USER_HOME = Path.home()
 DEFAULT_CONFIG_PATH = os.path.join(USER_HOME, '.config', 'obsidian-img-uploader')
+REMOTE_INDEX_PATH = os.path.join(DEFAULT_CONFIG_PATH, 'remote_index.sqlite3')
+HASH_CACHE_PATH = os.path.join(DEFAULT_CONFIG_PATH, 'hash_cache.sqlite3')
+MULTIPART_CHECKPOINT_PATH = os.path.join(DEFAULT_CONFIG_PATH, 'multipart')
+VAULT_INDEX_PATH = os.path.join(DEFAULT_CONFIG_PATH, 'vault_index.sqlite3')
+UPLOADED_URLS_PATH = os.path.join(DEFAULT_CONFIG_PATH, 'uploaded_urls.jsonl')
+BUCKET_REGION_CACHE_PATH = os.path.join(DEFAULT_CONFIG_PATH, 'bucket_regions.json')
+IMAGE_CACHE_PATH = os.path.join(DEFAULT_CONFIG_PATH, 'image_cache')
+METRICS_REPORT_PATH = os.path.join(DEFAULT_CONFIG_PATH, 'metrics.jsonl')
 OS = platform.system()
 
 
@@ -14,3 +22,11 @@ def show_env():
     log.info(f'APP_NAME: {APP_NAME}')
     log.info(f'USER_HOME: {USER_HOME}')
     log.info(f'DEFAULT_CONFIG_PATH: {DEFAULT_CONFIG_PATH}')
+    log.info(f'REMOTE_INDEX_PATH: {REMOTE_INDEX_PATH}')
+    log.info(f'HASH_CACHE_PATH: {HASH_CACHE_PATH}')
+    log.info(f'MULTIPART_CHECKPOINT_PATH: {MULTIPART_CHECKPOINT_PATH}')
+    log.info(f'VAULT_INDEX_PATH: {VAULT_INDEX_PATH}')
+    log.info(f'UPLOADED_URLS_PATH: {UPLOADED_URLS_PATH}')
+    log.info(f'BUCKET_REGION_CACHE_PATH: {BUCKET_REGION_CACHE_PATH}')
+    log.info(f'IMAGE_CACHE_PATH: {IMAGE_CACHE_PATH}')
+    log.info(f'METRICS_REPORT_PATH: {METRICS_REPORT_PATH}')
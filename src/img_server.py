@@ -4,12 +4,10 @@ from queue import Queue
 from PySide6.QtCore import Signal, QObject
 from loguru import logger as log
 
-from pkg.tencent_cos.cos import TencentCos
-from pkg.tencent_cos.cos_bucket import TencentCosBucket
-from src.config_loader import ConfigLoader
+from src.cos_server import CosServer
 
 
-class ImageServer(QObject):
+class ImageServer(QObject, CosServer):
     """图片服务器相关"""
     # Signal and Slots
     bucket_list = Signal(list)
@@ -19,76 +17,11 @@ class ImageServer(QObject):
     check_dirs_finished = Signal()
 
     def __init__(self):
-        super().__init__()
+        QObject.__init__(self)
+        CosServer.__init__(self)
         self.event_queue = Queue()
-        self.config = ConfigLoader().read_config()
-        self.cos_client = None
-        self.cos_bucket = None
         self._t = None
 
-    def _reload_config(self):
-        self.config = ConfigLoader().read_config()
-
-    def _is_server_config_changed(self):
-        latest_config = ConfigLoader().read_config()
-        if latest_config.cos.tencent.secret_id != self.config.cos.tencent.secret_id:
-            log.warning('User config cos.tencent.secret_id changed')
-            return True
-        elif latest_config.cos.tencent.secret_key != self.config.cos.tencent.secret_key:
-            log.warning('User config cos.tencent.secret_key changed')
-            return True
-        else:
-            return False
-
-    def reconnect_server(self):
-        """连接到腾讯COS，获取存储桶信息"""
-        if self._is_server_config_changed() or \
-                (not isinstance(self.cos_client, TencentCos)):
-            self._reload_config()
-            self.cos_client = None
-            self.cos_bucket = None
-            try:
-                self.cos_client = TencentCos(
-                    self.config.cos.tencent.secret_id, self.config.cos.tencent.secret_key)
-                log.info('reconnect server success')
-                return True
-            except Exception as e:
-                log.error(f'reconnect server error, detail: {str(e)}')
-                return False
-        else:
-            log.warning(self._is_server_config_changed())
-            log.warning(isinstance(self.cos_client, TencentCos))
-            log.info('reconnect server skipped')
-            return True
-
-    def connect_bucket(self, bucket_name: str):
-        """连接到COS存储桶"""
-        if not self.reconnect_server():
-            return False
-        elif isinstance(self.cos_bucket, TencentCosBucket):
-            return self._validate_bucket(bucket_name)
-        else:
-            return self._reconnect_bucket(bucket_name)
-
-    def _validate_bucket(self, bucket_name: str):
-        if bucket_name == self.cos_bucket.name:
-            log.info(f'Already connected to {bucket_name}.')
-            return True
-        elif bucket_name not in self.cos_client.list_buckets():
-            log.error(f'Cannot find bucket: {bucket_name}')
-            return False
-        else:
-            return self._reconnect_bucket(bucket_name)
-
-    def _reconnect_bucket(self, bucket_name: str):
-        try:
-            self.cos_bucket = TencentCosBucket(self.cos_client, bucket_name)
-            log.info(f'Connect to cos bucket {bucket_name} success!')
-            return True
-        except Exception as e:
-            log.error(str(e))
-            return False
-
     def list_bucket(self):
         """连接到腾讯COS，获取存储桶列表"""
         try:
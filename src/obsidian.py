@@ -1,49 +1,136 @@
+import html
 import os
 import re
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
+
+from loguru import logger as log
 
 from pkg.utils.file_tools import get_encoding
 
+OB_IMG_PATTERN = re.compile(r'!\[\[(.*?)]]')
+
 
 def find_ob_imgs(ob_file_path: str):
     if not os.path.exists(ob_file_path):
         return []
 
+    ob_imgs = set()
     with open(ob_file_path, 'r', encoding=get_encoding(ob_file_path)) as ob:
-        lines = ob.readlines()
+        for line in ob:
+            if '![[' in line:
+                ob_imgs.update(OB_IMG_PATTERN.findall(line))
+    return list(ob_imgs)
+
 
-    ob_imgs = []
-    ob_img_p = re.compile(r'!\[\[(.*)]]')
-    for line in lines:
-        ob_imgs.extend(re.findall(ob_img_p, line))
-    return list(set(ob_imgs))
+def build_srcset(variant_urls: list):
+    """由[(宽度, URL)]生成<img>的srcset属性值"""
+    return ', '.join(f'{url} {width}w' for width, url in sorted(variant_urls))
 
 
-def update_ob_file(ob_file_path: str, img_url_map: dict, suffix: str):
+def update_ob_file(ob_file_path: str, img_url_map: dict, suffix: str, srcset_map: dict = None):
+    """逐行流式改写笔记中的图片链接，没有需要改写的链接时不写入任何文件
+
+    srcset_map为{附件名: srcset属性值}，其中的图片改写为带srcset的HTML <img>标签，
+    手机等小屏幕设备只下载合适宽度的图片。
+    """
     if not os.path.exists(ob_file_path):
         return False, f'Obsidian文件 {ob_file_path} 不存在'
 
     new_ob_file_path = ob_file_path.replace('.md', f'{suffix}.md')
     tmp_ob_file_path = ob_file_path.replace('.md', f'.md.tmp')
-    with open(tmp_ob_file_path, 'w', encoding='utf-8') as new_ob:
-        with open(ob_file_path, 'r', encoding=get_encoding(ob_file_path)) as ob:
-            ob_lines = ob.readlines()
-
-        new_ob_lines = []
-        ob_img_p = re.compile(r'!\[\[(.*)]]')
-        for line in ob_lines:
-            line_imgs = re.findall(ob_img_p, line)
-            if line_imgs:
-                for img in line_imgs:
-                    _img_url = img_url_map.get(img)
-                    old = f'![[{img}]]'
-                    new = f'![{img}]({_img_url})'
-                    line = line.replace(old, new)
-            new_ob_lines.append(line)
-        new_ob.writelines(new_ob_lines)
+    encoding = get_encoding(ob_file_path)
+
+    def replace_img(match):
+        img = match.group(1)
+        img_url = img_url_map.get(img)
+        if img_url is None:  # 未上传的附件或嵌入的其他笔记，保持原样
+            return match.group(0)
+        srcset = srcset_map.get(img) if srcset_map else None
+        if srcset:
+            return f'<img src="{html.escape(img_url)}" srcset="{html.escape(srcset)}" alt="{html.escape(img)}">'
+        return f'![{img}]({img_url})'
+
+    new_ob = None
+    try:
+        with open(ob_file_path, 'r', encoding=encoding, newline='') as ob:
+            for line_no, line in enumerate(ob):
+                new_line = OB_IMG_PATTERN.sub(replace_img, line) if '![[' in line else line
+                if new_ob is None:
+                    if new_line == line:
+                        continue
+                    # 遇到第一处改动时才创建临时文件，并补写之前未改动的行
+                    new_ob = open(tmp_ob_file_path, 'w', encoding='utf-8', newline='')
+                    with open(ob_file_path, 'r', encoding=encoding, newline='') as head:
+                        new_ob.writelines(islice(head, line_no))
+                new_ob.write(new_line)
+    except Exception:
+        if new_ob is not None:  # 解码或写入失败时删除临时文件，避免残留在仓库中
+            new_ob.close()
+            os.remove(tmp_ob_file_path)
+        raise
+    finally:
+        if new_ob is not None:
+            new_ob.close()
+    if new_ob is None:
+        return True, ob_file_path
+
     if suffix:
-        os.rename(tmp_ob_file_path, new_ob_file_path)
+        os.replace(tmp_ob_file_path, new_ob_file_path)
     else:
-        os.remove(ob_file_path)
-        os.rename(tmp_ob_file_path, ob_file_path)
+        os.replace(tmp_ob_file_path, ob_file_path)
         new_ob_file_path = ob_file_path
     return True, new_ob_file_path
+
+
+def find_vault_notes(vault_path: str):
+    """列出Obsidian仓库中的所有笔记文件，忽略隐藏目录(如.obsidian、.trash)"""
+    notes = []
+    for root, dirs, files in os.walk(vault_path):
+        dirs[:] = [d for d in dirs if not d.startswith('.')]
+        notes.extend(os.path.join(root, f) for f in files if f.endswith('.md'))
+    return sorted(notes)
+
+
+def scan_notes(ob_file_paths: list, max_workers: int = None):
+    """扫描多个笔记引用的附件，返回 {笔记路径: [引用的附件名]}，笔记较多时使用进程池并行扫描
+
+    无法读取的笔记(如无法识别编码)记录日志后跳过，不出现在返回结果中。
+    """
+    if len(ob_file_paths) < 64:
+        results = [_safe_find_ob_imgs(note) for note in ob_file_paths]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(_safe_find_ob_imgs, ob_file_paths, chunksize=32))
+    note_imgs = {}
+    for note, (imgs, err) in zip(ob_file_paths, results):
+        if imgs is None:
+            log.warning(f'Scan note {note} failed, skipped, detail: {err}')
+        else:
+            note_imgs[note] = imgs
+    return note_imgs
+
+
+def update_ob_files(ob_file_paths: list, img_url_map: dict, suffix: str, max_workers: int = None,
+                    srcset_map: dict = None):
+    """使用进程池并行改写多个笔记，返回 {笔记路径: (是否成功, 新笔记路径或错误信息)}"""
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(partial(_safe_update_ob_file, img_url_map=img_url_map, suffix=suffix,
+                                       srcset_map=srcset_map),
+                               ob_file_paths, chunksize=8)
+        return dict(zip(ob_file_paths, results))
+
+
+def _safe_find_ob_imgs(ob_file_path: str):
+    try:
+        return find_ob_imgs(ob_file_path), ''
+    except Exception as e:
+        return None, str(e)
+
+
+def _safe_update_ob_file(ob_file_path: str, img_url_map: dict, suffix: str, srcset_map: dict = None):
+    try:
+        return update_ob_file(ob_file_path, img_url_map, suffix, srcset_map)
+    except Exception as e:
+        return False, str(e)
@@ -0,0 +1,618 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from queue import Queue
+
+from loguru import logger as log
+
+from pkg.tencent_cos.cos_index import CosObjectIndex
+from pkg.tencent_cos.key_index import RemoteKeyIndex
+from pkg.tencent_cos.multipart import MB, MultipartOptions
+from pkg.tencent_cos.exceptions import CosBucketDirNotFoundError, CosBucketNotFoundError
+from pkg.utils.callback_signal import CallbackSignal
+from pkg.utils.file_tools import is_image_file
+from pkg.utils.hash_cache import FileHashCache
+from pkg.utils.image_optimizer import ImageOptimizer, OptimizeOptions
+from pkg.utils.metrics import RunMetrics, append_json_report, write_prometheus_textfile
+from src.config_loader import ConfigLoader
+from src.env import REMOTE_INDEX_PATH, HASH_CACHE_PATH, MULTIPART_CHECKPOINT_PATH, VAULT_INDEX_PATH, \
+    UPLOADED_URLS_PATH, IMAGE_CACHE_PATH, METRICS_REPORT_PATH
+from src.cos_server import CosServer
+from src.obsidian import update_ob_files, build_srcset
+from src.vault_index import VaultIndex
+
+
+class SyncEngine(object):
+    """同步本地文件到腾讯COS的核心逻辑，不依赖Qt，GUI和命令行共用
+
+    状态通过CallbackSignal通知调用方，Uploader用同名的Qt Signal覆盖这些属性。
+    """
+    upload_progress_max_value = CallbackSignal(int)
+    upload_progress_value = CallbackSignal(int)
+    upload_bytes_progress = CallbackSignal(object, object)  # (已上传字节数, 总字节数)
+    console_log_text = CallbackSignal(str)
+    files_url = CallbackSignal(dict)
+    check_result = CallbackSignal(str)
+    check_finished = CallbackSignal()
+    upload_finished = CallbackSignal()
+    convert_finished = CallbackSignal()
+    watch_files_url = CallbackSignal(dict)
+    run_metrics = CallbackSignal(dict)  # 每次运行结束后的报告，见RunMetrics.to_dict
+
+    def __init__(self):
+        self._run_state = threading.local()  # 每个线程当前所在运行的RunMetrics
+        self.last_reports = {}  # {运行类型: 最近一次的运行报告}
+        self.config_service = ConfigLoader().service
+        self.last_checked_synced_files = []
+        self.hash_cache = FileHashCache(HASH_CACHE_PATH)
+        self.image_optimizer = None
+        self.optimized_files = {}
+        self.image_variants = {}  # {本地文件: (宽度, [ImageVariant])}
+        self.variant_urls = {}  # {本地文件: [(宽度, URL)]}，包含原图
+        self._reload_config()
+        self.server = CosServer()
+        self.cos_bucket = None  # 本次运行开始时连接的存储桶
+        self.local_files = []
+        self.check_md5 = False
+        self.refresh_remote = False
+        self.convert_suffix = self.config.obsidian.overwrite_suffix
+        self.remote_index = CosObjectIndex(REMOTE_INDEX_PATH)
+        self.vault_index = VaultIndex(VAULT_INDEX_PATH)
+        self.file_url_dict = {file: None for file in self.local_files}
+        self._bytes_lock = threading.Lock()
+        self._uploaded_bytes = 0
+        self._total_bytes = 0
+        self._upload_lock = threading.Lock()
+        self.event_queue = Queue()
+
+    def _reload_config(self):
+        """从配置缓存获取最新配置(只读)，配置文件未变化时不会重新解析
+
+        每次检查或上传开始时都会调用，上次检查的同步结果不能跨运行使用，否则本地修改过的同名文件会被跳过。
+        """
+        self.config = self.config_service.get_config()
+        self.bucket_name = self.config.cos.tencent.bucket
+        self.remote_dir = self.config.cos.tencent.dir
+        self.last_checked_synced_files = []
+        self._setup_image_optimizer()
+
+    def _setup_image_optimizer(self):
+        """按配置创建上传前的图片优化器，未开启或未安装Pillow时为None"""
+        optimize_config = self.config.optimize
+        if not optimize_config.enabled:
+            self.image_optimizer = None
+            return
+        if not ImageOptimizer.available():
+            if self.image_optimizer is not False:
+                log.warning('Image optimization is enabled but Pillow is not installed, skipped')
+            self.image_optimizer = False
+            return
+        options = OptimizeOptions(max_dimension=optimize_config.max_dimension,
+                                  strip_exif=optimize_config.strip_exif,
+                                  convert_format=optimize_config.convert_format,
+                                  quality=optimize_config.quality,
+                                  lossy_recompress=optimize_config.lossy_recompress)
+        if not self.image_optimizer or self.image_optimizer.options != options or \
+                self.image_optimizer.max_workers != optimize_config.workers:
+            self.image_optimizer = ImageOptimizer(IMAGE_CACHE_PATH, options, optimize_config.workers,
+                                                  self._get_md5sum)
+
+    @property
+    def metrics(self):
+        """当前线程所在运行的RunMetrics，不在运行中时为None
+
+        GUI触发的运行和自动同步的运行在不同线程中进行，各自统计，互不混入。
+        """
+        return getattr(self._run_state, 'metrics', None)
+
+    @contextmanager
+    def _metrics_run(self, kind: str):
+        """统计一次运行的各阶段耗时并在结束后输出报告，同一线程中的嵌套调用(如转换笔记时上传图片)计入外层运行"""
+        if self.metrics is not None:
+            yield self.metrics
+            return
+        metrics = self._run_state.metrics = RunMetrics(kind)
+        try:
+            yield metrics
+        finally:
+            self._run_state.metrics = None
+            self._report_metrics(metrics)
+
+    def _in_run(self, func):
+        """包装交给工作线程执行的函数，使其耗时计入提交任务的线程当前所在的运行"""
+        metrics = self.metrics
+
+        def run(*args, **kwargs):
+            previous, self._run_state.metrics = self.metrics, metrics
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._run_state.metrics = previous
+        return run
+
+    def _phase(self, phase: str, num_bytes: int = 0, count: int = 1):
+        """统计with块的耗时，不在运行中时不统计"""
+        metrics = self.metrics
+        return nullcontext() if metrics is None else metrics.phase(phase, num_bytes, count)
+
+    def _record(self, phase: str, seconds: float, num_bytes: int = 0, error: bool = False):
+        metrics = self.metrics
+        if metrics is not None:
+            metrics.record(phase, seconds, num_bytes, error=error)
+
+    def _emit(self, signal, *args):
+        """发送逐个文件的进度信号，并统计信号的耗时(GUI中为跨线程的Qt信号)"""
+        start = time.perf_counter()
+        signal.emit(*args)
+        self._record('signal', time.perf_counter() - start)
+
+    def _report_metrics(self, metrics: RunMetrics):
+        """输出运行报告：日志、JSON报告文件、Prometheus textfile和run_metrics信号"""
+        metrics.finish()
+        report = metrics.to_dict()
+        self.last_reports[metrics.kind] = report
+        log.info(report['summary'])
+        uploader_config = self.config.uploader
+        try:
+            if uploader_config.metrics_report:
+                append_json_report(report, METRICS_REPORT_PATH)
+            if uploader_config.metrics_textfile:
+                write_prometheus_textfile(list(self.last_reports.values()), uploader_config.metrics_textfile)
+        except Exception as e:
+            log.warning(f'Write metrics report failed, detail: {str(e)}')
+        self.run_metrics.emit(report)
+
+    def _get_md5sum(self, file_path: str):
+        """获取文件md5，只统计缓存未命中时实际计算哈希的耗时和字节数"""
+        md5sum = self.hash_cache.get_cached_md5sum(file_path)
+        if md5sum is None:
+            with self._phase('hash', os.path.getsize(file_path)):
+                md5sum = self.hash_cache.get_md5sum(file_path)
+        return md5sum
+
+    def _put_object(self, upload_path: str, object_key: str, md5sum: str, metadata_md5: str, progress_callback=None):
+        """上传一个对象到远程文件夹(PUT或分块上传)，统计耗时和字节数，成功时返回(True, ETag)"""
+        start = time.perf_counter()
+        ok, info = self.cos_bucket.upload_object(
+            upload_path, self.remote_dir + '/', md5sum=md5sum, progress_callback=progress_callback,
+            object_key=object_key, metadata_md5=metadata_md5)
+        self._record('put', time.perf_counter() - start, os.path.getsize(upload_path), error=not ok)
+        return ok, info
+
+    def _probe_object(self, remote_key: str):
+        """HEAD请求探测远程对象元数据，统计耗时"""
+        with self._phase('probe'):
+            return self.cos_bucket.probe_object(remote_key)
+
+    def _connect_bucket(self):
+        """连接到配置的存储桶并返回，连接失败时抛出异常，不返回None
+
+        每次检查或上传开始前连接一次，工作线程只使用self.cos_bucket，不再重新连接，
+        避免重新连接时CosServer.cos_bucket被其他线程置为None。
+        """
+        if not self.server.connect_bucket(self.bucket_name):
+            if self.server.cos_client is None:
+                raise ConnectionError('无法连接到腾讯云COS，请检查网络和SecretId/SecretKey配置')
+            raise CosBucketNotFoundError(f'无法连接到存储桶{self.bucket_name}，请检查存储桶名称')
+        self.cos_bucket = self.server.cos_bucket
+        self.cos_bucket.object_index = self.remote_index
+        return self.cos_bucket
+
+    def connect_bucket_dir(self):
+        """连接到腾讯COS，获取存储桶信息"""
+        self._reload_config()
+        self._connect_bucket()
+        log.info(f'config remote_dir -> {self.remote_dir}')
+        if self.remote_dir not in ['', '/'] and \
+                not self.cos_bucket.is_dir_exists(self.remote_dir):
+            raise CosBucketDirNotFoundError(f'在存储桶{self.bucket_name}中找不到{self.remote_dir}目录')
+
+    def _remote_prefix(self):
+        """远程文件夹对应的对象前缀，与TencentCosBucket.list_dir_files保持一致"""
+        if self.remote_dir in ['', '/'] or self.remote_dir.endswith('/'):
+            return self.remote_dir
+        return self.remote_dir + '/'
+
+    def _get_remote_files(self):
+        """从本地索引获取远程文件名的内存索引，本地索引过期或要求刷新时先从COS增量刷新"""
+        self._reload_config()
+        cos_bucket = self._connect_bucket()
+        prefix = self._remote_prefix()
+        if self.refresh_remote or not self.remote_index.is_fresh(
+                cos_bucket.full_name, prefix, self.config.uploader.remote_index_ttl):
+            if prefix not in ['', '/'] and not cos_bucket.is_dir_exists(prefix):
+                raise CosBucketDirNotFoundError(f'Bucket dir {prefix} not found.')
+            self.console_log_text.emit(f'正在从COS刷新存储桶{self.bucket_name}的远程文件索引...')
+            with self._phase('list'):
+                self.remote_index.refresh(cos_bucket, prefix)
+            self.refresh_remote = False
+        with self._phase('index'):
+            return self.remote_index.key_index(cos_bucket.full_name, prefix)
+
+    def _upload_object(self, local_file: str):
+        """上传单个文件(或优化后的图片)到远程文件夹，成功后就地更新本地索引
+
+        x-cos-meta-md5始终记录原图的md5，与本地附件比对即可判断是否已同步。
+        """
+        cos_bucket = self.cos_bucket
+        if self.image_optimizer and local_file not in self.optimized_files:
+            self.optimized_files.update(self.image_optimizer.optimize_files([local_file]))
+        upload_path = self._upload_path(local_file)
+        md5sum = self._get_md5sum(local_file)
+        content_md5 = md5sum if upload_path == local_file else self._get_md5sum(upload_path)
+        ok, info = self._put_object(upload_path, self._object_name(local_file), content_md5, md5sum,
+                                    progress_callback=self._in_run(self._add_uploaded_bytes))
+        if ok:
+            self.remote_index.upsert(cos_bucket.full_name, self._remote_key(local_file),
+                                     size=os.path.getsize(upload_path), etag=info, md5=md5sum)
+        else:
+            log.error(f'Upload {local_file} failed, detail: {info}')
+        return ok, info
+
+    def _add_uploaded_bytes(self, num_bytes: int):
+        """累计本次同步已完成的字节数(上传或跳过)，由各上传线程调用"""
+        with self._bytes_lock:
+            self._uploaded_bytes += num_bytes
+            uploaded_bytes = self._uploaded_bytes
+        self._emit(self.upload_bytes_progress, uploaded_bytes, self._total_bytes)
+
+    def _object_name(self, local_file: str):
+        """本地文件对应的远程对象名，图片转码后后缀会改变"""
+        optimized = self.optimized_files.get(local_file)
+        if optimized is not None:
+            return optimized.name
+        if self.image_optimizer:
+            return self.image_optimizer.object_name(local_file)
+        return local_file.split('/')[-1]
+
+    def _upload_path(self, local_file: str):
+        """实际上传的文件，开启图片优化时为优化后的缓存文件"""
+        optimized = self.optimized_files.get(local_file)
+        return local_file if optimized is None else optimized.path
+
+    def _remote_key(self, local_file: str):
+        """本地文件在远程文件夹中对应的对象全路径"""
+        return self.remote_dir + '/' + self._object_name(local_file)
+
+    def check_file(self, local_file: str, probe=None):
+        """校验是否有相同文件已存在于cos指定文件夹上，probe为已探测到的远程对象元数据"""
+        if probe is None:
+            result = self._check_file_from_index(local_file)
+            if result is not None:
+                return result
+            probe = self._probe_object(self._remote_key(local_file))
+        if not probe.exists:
+            return False, f'在存储桶{self.bucket_name}的{self.remote_dir}目录中找不到{local_file}文件'
+        md5_local = self._get_md5sum(local_file)
+        md5_remote = probe.metadata.get('x-cos-meta-md5')
+        self.remote_index.upsert(self.cos_bucket.full_name, probe.key,
+                                 size=probe.size, etag=probe.etag, md5=md5_remote)
+        if md5_local != md5_remote:
+            return False, f'文件{local_file}的MD5哈希校验不通过，远程存在同名文件'
+        return True, ''
+
+    def _check_file_from_index(self, local_file: str):
+        """根据本地索引中的md5或列表返回的ETag校验文件，无法判断(如分块上传对象)时返回None"""
+        if not self.config.uploader.verify_with_etag:
+            return None
+        entry = self.remote_index.get(self.cos_bucket.full_name, self._remote_key(local_file))
+        if entry is None:
+            return None
+        if entry['md5']:
+            md5_remote = entry['md5']
+        elif not self.image_optimizer and entry['ETag'] and '-' not in entry['ETag']:
+            # 简单上传对象的ETag即为内容MD5，图片经过优化时内容与原图不同，不能使用
+            md5_remote = entry['ETag'].strip('"')
+        else:
+            return None
+        if self._get_md5sum(local_file) != md5_remote:
+            return False, f'文件{local_file}的MD5哈希校验不通过，远程存在同名文件'
+        return True, ''
+
+    def _check_files_md5(self, local_files: list):
+        """批量校验远程已存在文件的MD5，优先使用索引，只对无法判断的文件并发发起HEAD请求"""
+        results = {}
+        need_probe = []
+        for local_file in local_files:
+            result = self._check_file_from_index(local_file)
+            if result is None:
+                need_probe.append(local_file)
+            else:
+                results[local_file] = result
+        remote_keys = [self._remote_key(f) for f in need_probe]
+        with ThreadPoolExecutor(max_workers=max(1, self.config.uploader.max_workers)) as executor:
+            probes = dict(zip(remote_keys, executor.map(self._in_run(self._probe_object), remote_keys)))
+        for local_file in need_probe:
+            results[local_file] = self.check_file(local_file, probes[self._remote_key(local_file)])
+        log.info(f'Check md5 of {len(local_files)} files, {len(need_probe)} of them by HEAD requests')
+        return results
+
+    def check_files(self):
+        """检查文件同步状态，全部已同步时返回True"""
+        with self._metrics_run('check'):
+            all_synced = self._check_files()
+        self.check_finished.emit()
+        return all_synced
+
+    def _check_files(self):
+        remote_files = self._get_remote_files()
+        self.console_log_text.emit('正在检查文件同步状态：')
+        has_not_synced = False
+        md5_results = {}
+        if self.check_md5 is True:
+            self.last_checked_synced_files.clear()
+            md5_results = self._check_files_md5(
+                [f for f in self.local_files if self._object_name(f) in remote_files])
+        for i in range(len(self.local_files)):
+            local_file = self.local_files[i]
+            local_file_name = local_file.split("/")[-1]
+            check_msg = f'[{i + 1}/{len(self.local_files)}] '
+            # 检查文件是否存在于远端
+            if self._object_name(local_file) not in remote_files:
+                sync_status = False
+                err_msg = '' if sync_status else \
+                    f'警告: 在存储桶{self.bucket_name}的{self.remote_dir}' \
+                    f'目录中找不到{local_file_name}文件'
+            else:  # 如果开启MD5校验则检查MD5
+                if self.check_md5 is True:
+                    sync_status, err_msg = md5_results[local_file]
+                else:
+                    sync_status, err_msg = True, ''
+
+            if sync_status is False:
+                check_msg += err_msg
+                has_not_synced = True
+            else:
+                check_msg += f'文件已同步: {local_file_name}'
+                if local_file not in self.last_checked_synced_files:
+                    self.last_checked_synced_files.append(local_file)
+
+            self._emit(self.check_result, check_msg)
+            self._emit(self.console_log_text, check_msg)
+
+        if not has_not_synced:
+            self.console_log_text.emit('全部文件已同步!')
+        else:
+            self.console_log_text.emit(
+                f'已同步文件数目: {len(self.last_checked_synced_files)}/{len(self.local_files)}')
+
+        current_time = str(datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        self.check_result.emit(f'已同步{len(self.last_checked_synced_files)}/{len(self.local_files)}, '
+                               f'检查时间{current_time}')
+        return not has_not_synced
+
+    def upload_files(self):
+        """将本地文件上传到服务器，返回上传失败的本地文件"""
+        with self._metrics_run('upload'):
+            failed = self._upload_local_files()
+            self.files_url.emit(self.file_url_dict)
+        self.upload_finished.emit()
+        return failed
+
+    def _upload_local_files(self, local_files: list = None, check_md5: bool = None):
+        """按配置的并发数同时上传本地文件，完成顺序不保证与文件顺序一致，返回上传失败的本地文件"""
+        local_files = self.local_files if local_files is None else local_files
+        check_md5 = self.check_md5 if check_md5 is None else check_md5
+        with self._upload_lock:  # GUI触发的同步与自动同步不会同时进行
+            for local_file in local_files:  # 上传失败的文件不保留之前的URL
+                self.file_url_dict[local_file] = None
+            remote_files = self._get_remote_files()
+            file_num = len(local_files)
+            self.upload_progress_max_value.emit(file_num)
+            self.optimized_files = self._optimize_files(local_files, remote_files, check_md5)
+            self.image_variants = self._make_variants(local_files)
+            self.cos_bucket.multipart = MultipartOptions(
+                threshold=self.config.uploader.multipart_threshold_mb * MB,
+                part_size=self.config.uploader.multipart_part_size_mb * MB,
+                max_workers=self.config.uploader.multipart_workers,
+                checkpoint_dir=MULTIPART_CHECKPOINT_PATH)
+            self._uploaded_bytes = 0
+            self._total_bytes = sum(os.path.getsize(self._upload_path(f))
+                                    for f in local_files if os.path.isfile(f))
+            self.upload_bytes_progress.emit(0, self._total_bytes)
+            max_workers = max(1, self.config.uploader.max_workers)
+            upload_file = self._in_run(self._upload_file)
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = {
+                    executor.submit(upload_file, local_file, remote_files, check_md5): local_file
+                    for local_file in local_files}
+                failed = []
+                for i, future in enumerate(as_completed(futures)):
+                    local_file = futures[future]
+                    msg = f'正在上传文件({i + 1}/{file_num})\n    '
+                    try:
+                        ok, info = future.result()
+                        msg += info
+                    except Exception as e:
+                        log.error(f'Upload {local_file} failed, detail: {str(e)}')
+                        ok = False
+                        msg += f'(上传失败)本地文件: {local_file}, 原因: {str(e)}'
+                    if not ok:
+                        failed.append(local_file)
+                    self._emit(self.console_log_text, msg)
+                    self._emit(self.upload_progress_value, i + 1)
+            return failed
+
+    def _optimize_files(self, local_files: list, remote_files: RemoteKeyIndex, check_md5: bool):
+        """上传前并行优化可能需要上传的图片(远程不存在或需要MD5校验)，返回 {本地文件: OptimizedImage}"""
+        if not self.image_optimizer:
+            return {}
+        candidates = [f for f in local_files if os.path.isfile(f) and (
+            self._object_name(f) not in remote_files or
+            (check_md5 and f not in self.last_checked_synced_files))]
+        if not candidates:
+            return {}
+        self.console_log_text.emit(f'正在优化{len(candidates)}个图片...')
+        size_before = sum(os.path.getsize(f) for f in candidates)
+        with self._phase('optimize', size_before, len(candidates)):
+            optimized = self.image_optimizer.optimize_files(candidates)
+        size_after = sum(os.path.getsize(o.path) for o in optimized.values())
+        self.console_log_text.emit(f'图片优化完成: {size_before / MB:.2f}MB -> {size_after / MB:.2f}MB')
+        return optimized
+
+    def _make_variants(self, local_files: list):
+        """按配置的宽度并行生成不同尺寸的图片，返回 {本地文件: (宽度, [ImageVariant])}"""
+        widths = self.config.optimize.variant_widths
+        if not self.image_optimizer or not widths:
+            return {}
+        self.console_log_text.emit(f'正在生成宽度为{widths}的图片...')
+        local_files = [f for f in local_files if os.path.isfile(f)]
+        with self._phase('variants', count=len(local_files)):
+            return self.image_optimizer.make_variants(local_files, widths)
+
+    def _upload_variants(self, local_file: str, remote_files: RemoteKeyIndex, overwrite: bool):
+        """上传图片的不同宽度版本，原图重新上传时覆盖，否则只上传远程缺少的，返回上传数目"""
+        full_width, variants = self.image_variants.get(local_file, (None, []))
+        if not variants:
+            return 0
+        cos_bucket = self.cos_bucket
+        md5sum = self._get_md5sum(local_file)
+        variant_urls = [(full_width, self.file_url_dict[local_file])]
+        uploaded = 0
+        for variant in variants:
+            remote_key = self.remote_dir + '/' + variant.name
+            if overwrite or variant.name not in remote_files:
+                ok, info = self._put_object(variant.path, variant.name, self._get_md5sum(variant.path), md5sum)
+                if not ok:
+                    log.error(f'Upload variant {variant.name} failed, detail: {info}')
+                    continue
+                self.remote_index.upsert(cos_bucket.full_name, remote_key,
+                                         size=os.path.getsize(variant.path), etag=info, md5=md5sum)
+                uploaded += 1
+            variant_urls.append((variant.width, cos_bucket.get_object_url(self.remote_dir + '/', variant.name)))
+        self.variant_urls[local_file] = variant_urls
+        return uploaded
+
+    def upload_changed_files(self, local_files: list):
+        """自动同步：上传附件目录中新增或修改的图片，强制MD5校验以覆盖内容变化的同名文件，并记录URL
+
+        返回上传失败的本地文件。
+        """
+        self.console_log_text.emit(f'检测到{len(local_files)}个新增或修改的附件，开始自动同步')
+        changed = set(local_files)
+        self.last_checked_synced_files = [f for f in self.last_checked_synced_files if f not in changed]
+        with self._metrics_run('watch'):
+            failed = self._upload_local_files(local_files, check_md5=True)
+        urls = {f: self.file_url_dict.get(f) for f in local_files if self.file_url_dict.get(f)}
+        self._record_urls(urls)
+        self.watch_files_url.emit(urls)
+        return failed
+
+    @staticmethod
+    def _record_urls(urls: dict):
+        """追加记录已上传文件的URL"""
+        upload_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with open(UPLOADED_URLS_PATH, 'a', encoding='utf-8') as f:
+            for local_file, url in urls.items():
+                f.write(json.dumps({'time': upload_time, 'file': local_file, 'url': url},
+                                   ensure_ascii=False) + '\n')
+
+    def convert_vault(self):
+        """批量转换整个Obsidian仓库：并行扫描笔记，统一上传所有引用到的图片，再并行改写笔记
+
+        全部图片上传成功且全部笔记改写成功时返回True。
+        """
+        self._reload_config()
+        vault_path = self.config.obsidian.vault_path
+        img_root = self.config.obsidian.attachment_path
+        max_workers = self.config.obsidian.convert_workers
+        try:
+            with self._metrics_run('convert'):
+                self.console_log_text.emit(f'正在扫描Obsidian仓库: {vault_path}')
+                with self._phase('scan'):
+                    changed, removed = self.vault_index.update(vault_path, max_workers)
+                self.console_log_text.emit(f'重新扫描了{len(changed)}个新增或修改的笔记')
+                note_imgs = self.vault_index.note_embeds(vault_path)
+                images = sorted({img for imgs in note_imgs.values() for img in imgs if is_image_file(img)})
+                self.local_files = [os.path.join(img_root, img).replace('\\', '/') for img in images
+                                    if os.path.isfile(os.path.join(img_root, img))]
+                self.console_log_text.emit(f'共{len(note_imgs)}个笔记引用了{len(images)}个图片，'
+                                           f'其中{len(self.local_files)}个图片在附件目录中')
+                return self.convert_notes(note_imgs) == 0
+        except Exception as e:
+            log.error(f'Convert vault {vault_path} failed, detail: {str(e)}')
+            self.console_log_text.emit(f'转换Obsidian仓库失败, 原因: {str(e)}')
+            return False
+        finally:
+            self.convert_finished.emit()
+
+    def convert_notes(self, note_imgs: dict):
+        """上传笔记引用的图片(self.local_files)并改写笔记，note_imgs为{笔记路径: 引用的图片}
+
+        返回失败数：上传失败的图片数与改写失败的笔记数之和，上传失败的图片在笔记中保持原样。
+        """
+        with self._metrics_run('convert'):
+            return self._convert_notes(note_imgs)
+
+    def _convert_notes(self, note_imgs: dict):
+        max_workers = self.config.obsidian.convert_workers
+        failed_files = self._upload_local_files()
+        img_url_map = {f.split('/')[-1]: url for f, url in self.file_url_dict.items()
+                       if f in self.local_files and url}
+        srcset_map = None
+        if self.config.optimize.srcset:
+            srcset_map = {f.split('/')[-1]: build_srcset(urls) for f, urls in self.variant_urls.items()
+                          if f in self.local_files and len(urls) > 1}
+        with self._phase('rewrite', count=len(note_imgs)):
+            results = update_ob_files(list(note_imgs), img_url_map, self.convert_suffix, max_workers, srcset_map)
+        for note, (result, info) in results.items():
+            if result is not True:
+                self.console_log_text.emit(f'更新文件失败: {note}, 原因: {info}')
+        succeeded = sum(1 for result, _ in results.values() if result is True)
+        self.console_log_text.emit('-' * 20 + f'已更新{succeeded}/{len(results)}个笔记文件' + '-' * 20)
+        if failed_files:
+            self.console_log_text.emit(f'{len(failed_files)}个图片上传失败，笔记中的对应链接未改写')
+        return len(failed_files) + len(results) - succeeded
+
+    def _upload_file(self, local_file: str, remote_files: RemoteKeyIndex, check_md5: bool):
+        """上传单个文件（在工作线程中运行），返回(是否成功, 上传结果信息)
+
+        只有上传成功或确认远程已存在时才记录URL，上传失败的图片在笔记中保持原样。
+        """
+        msg = ''
+        file_name = self._object_name(local_file)
+        assert os.path.isfile(local_file), f'can not find file {local_file}!'
+        uploaded = False
+        ok = True
+
+        # 如果远端没有此文件，直接上传
+        if file_name not in remote_files:
+            log.warning(f'Uploading: {local_file}')
+            ok, info = self._upload_object(local_file)
+            uploaded = True
+            msg += f'(上传成功)本地文件: {local_file} \n    ' if ok else \
+                f'(上传失败)本地文件: {local_file}, 原因: {info} \n    '
+        else:
+            # 如果没有开启MD5校验，跳过上传
+            if check_md5 is False:
+                msg += f'(远程已存在)本地文件: {local_file} \n    '
+            else:
+                # 如果开启MD5校验，且上次检查同步的结果还在，直接从缓存读取
+                if local_file in self.last_checked_synced_files:
+                    msg += f'(远程已存在)本地文件: {local_file} \n    '
+                # 否则重新校验文件，耗时较长
+                else:
+                    sync_status, err_msg = self.check_file(local_file)
+                    if sync_status:  # 校验成功，跳过上传
+                        msg += f'(远程已存在)本地文件: {local_file} \n    '
+                    else:  # 校验失败，覆盖式上传
+                        log.warning(err_msg)
+                        ok, info = self._upload_object(local_file)
+                        uploaded = True
+                        msg += f'(上传覆盖成功)本地文件: {local_file} \n    ' if ok else \
+                            f'(上传覆盖失败)本地文件: {local_file}, 原因: {info} \n    '
+        if not uploaded:
+            self._add_uploaded_bytes(os.path.getsize(self._upload_path(local_file)))
+        if not ok:
+            return False, msg.rstrip()
+        file_url = self.cos_bucket.get_object_url(self.remote_dir + '/', self._object_name(local_file))
+        msg += f'远程URL: {file_url}'
+        self.file_url_dict[local_file] = file_url
+        variants_uploaded = self._upload_variants(local_file, remote_files, uploaded)
+        if variants_uploaded:
+            msg += f'\n    (上传成功){variants_uploaded}个不同宽度的图片'
+        return True, msg
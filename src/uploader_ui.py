@@ -15,6 +15,7 @@ from src.config_loader import ConfigLoader
 from src.img_server_ui import SetupImageServerDialog
 from src.obsidian import find_ob_imgs, update_ob_file
 from src.uploader import Uploader
+from src.watcher import AttachmentWatcher
 from src.env import USER_HOME, OS
 
 
@@ -26,6 +27,7 @@ class ObsidianImageUploader(QWidget):
         self.config_loader = ConfigLoader()
         self.config = self.config_loader.read_config()
         self.overwrite = False
+        self.attachment_watcher = None
         self.ob_valut_path = self.config.obsidian.vault_path
         self._init_ui()
         self._init_upload_thread()
@@ -38,6 +40,7 @@ class ObsidianImageUploader(QWidget):
         self.upload_worker = Uploader()
         self.upload_worker.moveToThread(self.upload_thread)
         reconnect(self.upload_worker.check_result, self.update_check_result)
+        reconnect(self.upload_worker.run_metrics, self.update_run_metrics)
 
     def _init_ui(self):
         self._init_attachment_ui()
@@ -85,17 +88,31 @@ class ObsidianImageUploader(QWidget):
             '(2)同步时默认覆盖文件名一致但完整性校验失败的文件')
         self.enable_md5_check_checkbox.setChecked(Qt.CheckState.Unchecked)
         self.enable_md5_check_checkbox.stateChanged.connect(self.show_md5_check_status)
+        self.refresh_remote_checkbox = QCheckBox('从COS刷新')
+        self.refresh_remote_checkbox.setToolTip(
+            '远程文件列表默认从本地索引读取，如果开启此项:\n'
+            '检查或同步前先从COS重新拉取远程文件列表并更新本地索引')
+        self.refresh_remote_checkbox.setChecked(False)
         check_layout.addWidget(self.check_sync_status_btn)
         check_layout.addWidget(self.check_result_label)
         check_layout.addStretch(1)
+        check_layout.addWidget(self.refresh_remote_checkbox)
         check_layout.addWidget(self.enable_md5_check_checkbox)
 
         sync_layout = QHBoxLayout()
         self.sync_all_images_btn = QPushButton('同步附件图片')
         self.sync_all_images_btn.clicked.connect(self.sync_all_image)
         self.sync_progress_bar = QProgressBar()
+        self.watch_attachment_checkbox = QCheckBox('自动同步新附件')
+        self.watch_attachment_checkbox.setToolTip(
+            '如果开启此项:\n'
+            '监听Obsidian附件文件夹，新增或修改的图片将在几秒内自动上传到图床，\n'
+            '上传后的URL记录在配置目录的uploaded_urls.jsonl中')
+        self.watch_attachment_checkbox.setChecked(False)
+        self.watch_attachment_checkbox.stateChanged.connect(self.toggle_watch_attachment)
         sync_layout.addWidget(self.sync_all_images_btn)
         sync_layout.addWidget(self.sync_progress_bar)
+        sync_layout.addWidget(self.watch_attachment_checkbox)
 
         self.check_sync_layout = QVBoxLayout()
         self.check_sync_layout.addWidget(self.func_1_label)
@@ -103,7 +120,7 @@ class ObsidianImageUploader(QWidget):
         self.check_sync_layout.addLayout(sync_layout)
 
     def _init_convert_ui(self):
-        self.func_2_label = QLabel('功能2：将单个Obsidian笔记文件图片链接转换为标准Markdown形式')
+        self.func_2_label = QLabel('功能2：将Obsidian笔记文件图片链接转换为标准Markdown形式')
 
         overwrite_layout = QHBoxLayout()
         self.overwrite_checkbox = QCheckBox('覆盖原始Obsidian文件')
@@ -125,6 +142,21 @@ class ObsidianImageUploader(QWidget):
         md_file_layout.addWidget(self.import_ob_md_btn)
         md_file_layout.addWidget(self.ob_md_file_path)
 
+        self.convert_vault_checkbox = QCheckBox('转换整个Obsidian仓库')
+        self.convert_vault_checkbox.setToolTip(
+            '如果开启此项:\n'
+            '(1)并行扫描仓库中的所有笔记，统一上传所有引用到的图片\n'
+            '(2)批量改写仓库中所有引用了图片的笔记，忽略上方选择的单个笔记文件')
+        self.convert_vault_checkbox.setCheckState(Qt.CheckState.Unchecked)
+        self.change_vault_btn = QPushButton('配置Obsidian仓库路径')
+        self.change_vault_btn.clicked.connect(self.change_ob_vault_path)
+        self.ob_vault_path = QLineEdit()
+        self.ob_vault_path.setText(self.config.obsidian.vault_path)
+        vault_layout = QHBoxLayout()
+        vault_layout.addWidget(self.convert_vault_checkbox)
+        vault_layout.addWidget(self.change_vault_btn)
+        vault_layout.addWidget(self.ob_vault_path)
+
         self.start_convert_btn = QPushButton('开始转换Obsidian笔记')
         self.start_convert_btn.clicked.connect(self.start_convert_to_stmd)
         self.convert_progressbar = QProgressBar()
@@ -136,6 +168,7 @@ class ObsidianImageUploader(QWidget):
         self.convert_layout.addWidget(self.func_2_label)
         self.convert_layout.addLayout(overwrite_layout)
         self.convert_layout.addLayout(md_file_layout)
+        self.convert_layout.addLayout(vault_layout)
         self.convert_layout.addLayout(c2_layout)
 
     def _init_console_ui(self):
@@ -178,6 +211,7 @@ class ObsidianImageUploader(QWidget):
         reconnect(self.upload_worker.upload_finished, self.upload_thread.quit)
         reconnect(self.upload_worker.upload_progress_max_value, self.update_sync_p_bar_max_value)
         reconnect(self.upload_worker.upload_progress_value, self.update_sync_p_bar_value)
+        reconnect(self.upload_worker.upload_bytes_progress, self.update_sync_p_bar_bytes)
         self.disable_sync_btns_until_finished()
         self.upload_thread.start()
 
@@ -188,7 +222,33 @@ class ObsidianImageUploader(QWidget):
         file_paths = [p.replace('\\', '/') for p in file_paths if OS.lower() == 'windows']
         self.upload_worker.local_files = file_paths
         self.upload_worker.check_md5 = self.enable_md5_check_checkbox.isChecked()
+        self.upload_worker.refresh_remote = self.refresh_remote_checkbox.isChecked()
+        reconnect(self.upload_worker.console_log_text, self.update_console)
+
+    def toggle_watch_attachment(self):
+        if self.attachment_watcher is not None:
+            self.attachment_watcher.stop()
+            self.attachment_watcher = None
+            self.console_textedit.append('已停止自动同步新附件')
+        if not self.watch_attachment_checkbox.isChecked():
+            return
+        attachment_path = self.ob_attachment_path.text()
+        if not os.path.isdir(attachment_path):
+            self.console_textedit.append(f'无效的Obsidian附件路径: {attachment_path}')
+            self.watch_attachment_checkbox.setChecked(False)
+            return
         reconnect(self.upload_worker.console_log_text, self.update_console)
+        self.attachment_watcher = AttachmentWatcher(
+            attachment_path, self.upload_worker.upload_changed_files,
+            debounce=self.config.uploader.watch_debounce,
+            poll_interval=self.config.uploader.watch_poll_interval)
+        self.attachment_watcher.start()
+        self.console_textedit.append(f'正在自动同步新附件: {attachment_path}')
+
+    def closeEvent(self, event):
+        if self.attachment_watcher is not None:
+            self.attachment_watcher.stop()
+        super().closeEvent(event)
 
     def update_sync_p_bar_max_value(self, max_value):
         self.sync_progress_bar.setMaximum(max_value)
@@ -196,6 +256,10 @@ class ObsidianImageUploader(QWidget):
     def update_sync_p_bar_value(self, value):
         self.sync_progress_bar.setValue(value)
 
+    def update_sync_p_bar_bytes(self, uploaded_bytes, total_bytes):
+        self.sync_progress_bar.setFormat(
+            f'%v/%m  ({uploaded_bytes / 1024 / 1024:.1f}/{total_bytes / 1024 / 1024:.1f} MB)')
+
     def import_ob_md_file(self):
         dlg_open_files = QFileDialog()
         if os.path.exists(self.ob_md_file_path.text()):
@@ -236,8 +300,57 @@ class ObsidianImageUploader(QWidget):
         self.config_loader.update_config(self.config)
         self.ob_attachment_path.setText(new_path)
 
+    def change_ob_vault_path(self):
+        if os.path.exists(self.ob_vault_path.text()):
+            cur_path = self.ob_vault_path.text()
+        else:
+            cur_path = USER_HOME
+        dlg_open_path = QFileDialog()
+        new_path = ''
+        try:
+            new_path = dlg_open_path.getExistingDirectory(
+                caption="选取Obsidian仓库", dir=cur_path)
+        except Exception as e:
+            log.error(e)
+            log.error(traceback.format_exc())
+        finally:
+            if not new_path:
+                new_path = cur_path
+        self.config.obsidian.vault_path = new_path
+        self.config_loader.update_config(self.config)
+        self.ob_vault_path.setText(new_path)
+
+    def start_convert_vault(self):
+        vault_path = self.ob_vault_path.text()
+        if not os.path.isdir(vault_path) or os.path.dirname(os.path.abspath(vault_path)) == \
+                os.path.abspath(vault_path):
+            self.console_textedit.append(f'无效的Obsidian仓库路径: {vault_path}')
+            self.start_convert_btn.setEnabled(True)
+            return
+        if self.overwrite is True:
+            suffix = ''
+        else:
+            suffix = self.overwrite_suffix.text()
+            self.config.obsidian.overwrite_suffix = suffix
+        self.config.obsidian.vault_path = vault_path
+        self.config.obsidian.attachment_path = self.ob_attachment_path.text()
+        self.config_loader.update_config(self.config)
+        self.upload_worker.convert_suffix = suffix
+        self.upload_worker.check_md5 = self.enable_md5_check_checkbox.isChecked()
+        self.console_textedit.append('=' * 80)
+        reconnect(self.upload_worker.console_log_text, self.update_console)
+        reconnect(self.upload_worker.upload_progress_max_value, self.update_convert_p_bar_max_value)
+        reconnect(self.upload_worker.upload_progress_value, self.update_convert_p_bar_value)
+        reconnect(self.upload_thread.started, self.upload_worker.convert_vault)
+        reconnect(self.upload_worker.convert_finished, [
+            self.upload_thread.quit, lambda: self.start_convert_btn.setEnabled(True)])
+        log.info(f'convert vault {vault_path} ready to start')
+        self.upload_thread.start()
+
     def start_convert_to_stmd(self):
         self.start_convert_btn.setDisabled(True)
+        if self.convert_vault_checkbox.isChecked():
+            return self.start_convert_vault()
         ob_file = self.ob_md_file_path.text()
         log.info(f'Obsidian文件: {ob_file}')
         try:
@@ -266,6 +379,9 @@ class ObsidianImageUploader(QWidget):
     def update_console(self, log_msg):
         self.console_textedit.append(log_msg)
 
+    def update_run_metrics(self, report: dict):
+        self.console_textedit.append(report['summary'])
+
     def update_ob_files_url(self, url_dict):
         ob_file = self.ob_md_file_path.text()
         pure_url_dict = {}
@@ -0,0 +1,94 @@
+import os
+import sqlite3
+import threading
+
+from loguru import logger as log
+
+from src.obsidian import find_vault_notes, scan_notes
+
+_MAX_CHAR = '\U0010ffff'
+
+
+class VaultIndex(object):
+    """Obsidian仓库中笔记与附件引用关系(![[...]])的持久化索引，按笔记的大小和mtime增量更新"""
+
+    def __init__(self, db_path: str):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS notes ('
+                'path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER)')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS embeds ('
+                'note TEXT NOT NULL, target TEXT NOT NULL, PRIMARY KEY (note, target)) WITHOUT ROWID')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS embeds_target ON embeds (target)')
+
+    @staticmethod
+    def _vault_prefix(vault_path: str):
+        return os.path.join(os.path.abspath(vault_path), '')
+
+    def update(self, vault_path: str, max_workers: int = None):
+        """增量更新索引：只重新扫描新增或修改过的笔记，并移除已删除的笔记
+
+        扫描失败的笔记不记录大小和mtime，下次更新时重新扫描。
+
+        Returns:
+            (重新扫描的笔记列表, 已删除的笔记列表)
+        """
+        prefix = self._vault_prefix(vault_path)
+        notes = {}
+        for note in find_vault_notes(prefix):
+            stat = os.stat(note)
+            notes[note] = (stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            known = {row[0]: (row[1], row[2]) for row in self._conn.execute(
+                'SELECT path, size, mtime_ns FROM notes WHERE path >= ? AND path < ?',
+                (prefix, prefix + _MAX_CHAR))}
+        changed = [note for note, signature in notes.items() if known.get(note) != signature]
+        removed = [note for note in known if note not in notes]
+
+        note_imgs = scan_notes(changed, max_workers)
+        failed = [note for note in changed if note not in note_imgs]
+        changed = [note for note in changed if note in note_imgs]
+        with self._lock, self._conn:
+            self._conn.executemany('DELETE FROM embeds WHERE note = ?',
+                                   [(note,) for note in changed + removed + failed])
+            self._conn.executemany('DELETE FROM notes WHERE path = ?', [(note,) for note in removed + failed])
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO notes (path, size, mtime_ns) VALUES (?, ?, ?)',
+                [(note, *notes[note]) for note in changed])
+            self._conn.executemany(
+                'INSERT OR IGNORE INTO embeds (note, target) VALUES (?, ?)',
+                [(note, img) for note, imgs in note_imgs.items() for img in imgs])
+        log.info(f'Update vault index of {prefix}: {len(notes)} notes, '
+                 f'{len(changed)} rescanned, {len(removed)} removed, {len(failed)} failed')
+        return changed, removed
+
+    def note_embeds(self, vault_path: str):
+        """获取仓库中所有有引用的笔记 {笔记路径: [引用的附件名]}"""
+        prefix = self._vault_prefix(vault_path)
+        note_imgs = {}
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT note, target FROM embeds WHERE note >= ? AND note < ? ORDER BY note',
+                (prefix, prefix + _MAX_CHAR)).fetchall()
+        for note, target in rows:
+            note_imgs.setdefault(note, []).append(target)
+        return note_imgs
+
+    def notes_referencing(self, vault_path: str, image_name: str):
+        """反向查询：获取仓库中引用了指定附件的所有笔记，例如附件修改后需要重新转换的笔记"""
+        prefix = self._vault_prefix(vault_path)
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT note FROM embeds WHERE target = ? AND note >= ? AND note < ? ORDER BY note',
+                (image_name, prefix, prefix + _MAX_CHAR)).fetchall()
+        return [row[0] for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,154 @@
+import os
+import threading
+import time
+
+from loguru import logger as log
+
+from pkg.utils.file_tools import is_image_file
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # 未安装watchdog时使用轮询
+    FileSystemEventHandler = object
+    Observer = None
+
+
+class _ImageEventHandler(FileSystemEventHandler):
+    """watchdog事件处理，只关心新增、修改和移入的图片文件"""
+
+    def __init__(self, watcher):
+        super().__init__()
+        self.watcher = watcher
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.watcher.mark_changed(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.watcher.mark_changed(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.watcher.mark_changed(event.dest_path)
+
+
+class AttachmentWatcher(object):
+    """监听Obsidian附件目录，新增或修改的图片经过防抖后批量交给回调处理
+
+    优先使用watchdog(Linux下基于inotify)，未安装watchdog或启动失败时退化为定时轮询目录。
+    一批变化在debounce秒内没有新的事件且文件大小不再变化时才会触发回调，避免上传写入中的文件。
+    """
+
+    def __init__(self, attachment_path: str, on_files, debounce: float = 2.0,
+                 poll_interval: float = 2.0):
+        self.attachment_path = attachment_path
+        self.on_files = on_files
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self._pending = {}  # {文件路径: (最近一次事件时间, 文件大小)}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._observer = None
+        self._snapshot = {}
+        self._thread = None
+
+    @property
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.is_running:
+            return
+        self._stop_event.clear()
+        if Observer is not None:
+            try:
+                self._observer = Observer()
+                self._observer.schedule(_ImageEventHandler(self), self.attachment_path, recursive=False)
+                self._observer.start()
+                log.info(f'Watch {self.attachment_path} with {type(self._observer).__name__}')
+            except Exception as e:
+                log.warning(f'Start watchdog observer failed, fallback to polling, detail: {str(e)}')
+                self._observer = None
+        if self._observer is None:
+            self._snapshot = self._scan()
+            log.info(f'Watch {self.attachment_path} by polling every {self.poll_interval}s')
+        self._thread = threading.Thread(target=self._run, name='attachment-watcher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        log.info(f'Stop watching {self.attachment_path}')
+
+    def mark_changed(self, file_path: str):
+        """记录一个发生变化的文件，由watchdog事件或轮询调用"""
+        file_path = file_path.replace('\\', '/')
+        if not is_image_file(file_path):
+            return
+        with self._lock:
+            self._pending[file_path] = (time.monotonic(), self._file_size(file_path))
+
+    @staticmethod
+    def _file_size(file_path: str):
+        try:
+            return os.path.getsize(file_path)
+        except OSError:
+            return None
+
+    def _scan(self):
+        snapshot = {}
+        try:
+            with os.scandir(self.attachment_path) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        stat = entry.stat()
+                        snapshot[entry.path] = (stat.st_size, stat.st_mtime_ns)
+        except OSError as e:
+            log.warning(f'Scan {self.attachment_path} failed, detail: {str(e)}')
+        return snapshot
+
+    def _poll(self):
+        snapshot = self._scan()
+        for file_path, signature in snapshot.items():
+            if self._snapshot.get(file_path) != signature:
+                self.mark_changed(file_path)
+        self._snapshot = snapshot
+
+    def _take_ready_files(self):
+        """取出已经稳定(超过防抖时间且大小不变)的文件"""
+        now = time.monotonic()
+        ready = []
+        with self._lock:
+            for file_path, (event_time, size) in list(self._pending.items()):
+                if now - event_time < self.debounce:
+                    continue
+                current_size = self._file_size(file_path)
+                if current_size is None:
+                    del self._pending[file_path]
+                elif current_size != size:
+                    self._pending[file_path] = (now, current_size)
+                else:
+                    del self._pending[file_path]
+                    ready.append(file_path)
+        return sorted(ready)
+
+    def _run(self):
+        last_poll = 0
+        while not self._stop_event.wait(0.5):
+            if self._observer is None and time.monotonic() - last_poll >= self.poll_interval:
+                self._poll()
+                last_poll = time.monotonic()
+            ready = self._take_ready_files()
+            if ready:
+                try:
+                    self.on_files(ready)
+                except Exception as e:
+                    log.error(f'Handle changed attachments failed, detail: {str(e)}')